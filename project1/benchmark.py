@@ -0,0 +1,180 @@
+import argparse
+import json
+import resource
+import sys
+import time
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+from environments.cartpole import CartPole
+from environments.environment import Environment
+from environments.gambler import Gambler
+from environments.towers_of_hanoi import TowersOfHanoi
+from learner.actor_critic import ActorCritic
+from learner.actors.actor import Actor
+from learner.critics.critic import Critic
+from learner.critics.network_critic import NetworkCritic
+from learner.critics.table_critic import TableCritic
+from learner.utils.profiler import PhaseProfiler
+from utils.seeding import set_seed
+
+SEED = 14
+
+# Environment factories and when a fit counts as solved (None: no solve criterion)
+ENVIRONMENTS: dict[str, tuple[Callable[[], Environment], Optional[Callable[[int, Environment], bool]]]] = {
+    'CartPole': (lambda: CartPole(buckets=(6, 6, 6, 6), n_timesteps=300),
+                 lambda steps, env: steps >= env.n_timesteps),
+    'Gambler': (lambda: Gambler(win_probability=0.4, goal_money=100),
+                None),
+    'TowersOfHanoi': (lambda: TowersOfHanoi(n_disks=4, n_pegs=3, n_timesteps=300),
+                      lambda steps, env: steps <= 2 ** env.n_disks - 1),
+}
+
+CRITICS: dict[str, Callable[[Environment], Critic]] = {
+    'TableCritic': lambda env: TableCritic(environment=env, discount=0.99, trace_decay=0.9),
+    'NetworkCritic': lambda env: NetworkCritic(environment=env, discount=0.99, layer_sizes=[6, 4, 4]),
+}
+
+# Metrics where higher is better. These are the ones compared against a baseline.
+THROUGHPUT_METRICS = ['env_steps_per_second', 'updates_per_second', 'calls_per_second']
+
+
+def run_fit_benchmark(environment_name: str, critic_name: str, n_episodes: int) -> dict:
+    """Fits an ActorCritic with a fixed seed and measures its throughput.
+
+    Meant to be run in a fresh process. The process is forked, so its peak RSS includes the peak of the parent;
+    the memory of the benchmark is therefore measured as the growth of the peak RSS during the fit.
+
+    :param environment_name: Key into ENVIRONMENTS.
+    :param critic_name: Key into CRITICS.
+    :param n_episodes: Number of episodes to fit for.
+    :return: Benchmark results.
+    """
+
+    start_peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    set_seed(SEED)
+    make_environment, is_solved = ENVIRONMENTS[environment_name]
+    environment = make_environment()
+    actor = Actor(environment, discount=0.99, trace_decay=0.9, epsilon_decay=0.04)
+    actor_critic = ActorCritic(environment, actor, CRITICS[critic_name](environment))
+
+    profiler = PhaseProfiler()
+    start = time.perf_counter()
+    actor_critic.fit(n_episodes, verbose=False, profiler=profiler)
+    fit_time = time.perf_counter() - start
+
+    total_steps = int(actor_critic.steps.sum())
+    phase_times = dict(zip(PhaseProfiler.PHASES, np.sum(profiler.phase_times, axis=0)))
+    update_time = phase_times['get_delta'] + phase_times['update_v'] + phase_times['update_pi']
+
+    episodes_to_solve = None
+    if is_solved is not None:
+        solved = [i for i, steps in enumerate(actor_critic.steps) if is_solved(steps, environment)]
+        episodes_to_solve = solved[0] + 1 if solved else None
+
+    return {
+        'name': f'{environment_name}-{critic_name}',
+        'episodes': n_episodes,
+        'steps': total_steps,
+        'fit_time': fit_time,
+        'env_steps_per_second': total_steps / fit_time,
+        'updates_per_second': total_steps / update_time,
+        'peak_memory_growth_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_peak_rss) / 1024,
+        'episodes_to_solve': episodes_to_solve,
+    }
+
+
+def run_micro_benchmarks(number: int) -> list[dict]:
+    """Times isolated hot-path operations.
+
+    :param number: Number of calls timed for each operation.
+    :return: Benchmark results, one per operation.
+    """
+
+    set_seed(SEED)
+    cartpole = CartPole(buckets=(6, 6, 6, 6), n_timesteps=number + 1)
+    cartpole.initialize()
+
+    hanoi = TowersOfHanoi(n_disks=4, n_pegs=3)
+    # Traces that never decay or get dropped, so every timed update touches the same 20 traces
+    actor = Actor(hanoi, discount=1.0, trace_decay=1.0, trace_cutoff=0.0)
+    for state in list(np.ndindex(hanoi.state_shape))[:20]:  # Typical active trace length
+        actor.choose_action(state, episode=0)
+
+    critic = NetworkCritic(environment=hanoi, layer_sizes=[6, 4, 4])
+    state = (1, 2, 0, 1)
+
+    operations = {
+        'CartPole.next': lambda: cartpole.next(1),
+        'Actor.update_pi': lambda: actor.update_pi(0.1, 0),
+        'NetworkCritic.encode_state': lambda: critic.encode_state(state),
+    }
+    results = []
+    for name, operation in operations.items():
+        seconds = timeit.timeit(operation, number=number)
+        results.append({'name': name, 'calls': number, 'calls_per_second': number / seconds})
+    return results
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """Compares throughput metrics against a baseline.
+
+    :param results: Current benchmark results.
+    :param baseline: Baseline benchmark results.
+    :param threshold: Allowed relative slowdown, e.g. 0.2 for 20%.
+    :return: Descriptions of the metrics that slowed down more than threshold.
+    """
+
+    baseline_by_name = {b['name']: b for b in baseline}
+    regressions = []
+    for result in results:
+        base = baseline_by_name.get(result['name'])
+        if base is None:
+            continue
+        for metric in THROUGHPUT_METRICS:
+            if metric in result and metric in base and result[metric] < (1 - threshold) * base[metric]:
+                slowdown = 1 - result[metric] / base[metric]
+                regressions.append(f'{result["name"]} {metric}: {result[metric]:.0f} vs {base[metric]:.0f} '
+                                   f'baseline ({100 * slowdown:.1f}% slower)')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-e', '--episodes', type=int, default=200, help='Number of episodes per fit benchmark.')
+    parser.add_argument('-n', '--number', type=int, default=10000, help='Number of calls per micro-benchmark.')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='path/to/results/file (.json)')
+    parser.add_argument('-b', '--baseline', help='path/to/baseline/results/file (.json) to compare against.')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2, help='Allowed relative slowdown vs baseline.')
+    args = parser.parse_args()
+
+    results = []
+    for environment_name in ENVIRONMENTS:
+        for critic_name in CRITICS:
+            # A fresh process per benchmark, so peak memory is not shared between benchmarks
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(run_fit_benchmark, environment_name, critic_name, args.episodes).result()
+            print(f'{result["name"]}: {result["env_steps_per_second"]:.0f} env steps/s, '
+                  f'{result["updates_per_second"]:.0f} updates/s, +{result["peak_memory_growth_mb"]:.0f} MB, '
+                  f'solved after {result["episodes_to_solve"]} episodes')
+            results.append(result)
+
+    for result in run_micro_benchmarks(args.number):
+        print(f'{result["name"]}: {result["calls_per_second"]:.0f} calls/s')
+        results.append(result)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Saved results to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION: {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No slowdowns above {100 * args.threshold:.0f}% compared to {args.baseline}')
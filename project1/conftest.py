@@ -0,0 +1,2 @@
+# Makes the top-level packages (environments, learner, utils) importable when pytest is run from outside project1,
+# where pytest.ini is not found: pytest inserts the directory of a rootless conftest.py into sys.path.
@@ -3,7 +3,6 @@ import random
 from typing import Optional
 
 import numpy as np
-from matplotlib import pyplot as plt
 
 from environments.environment import Environment
 
@@ -73,16 +72,42 @@ class CartPole(Environment):
             bucketized.append(bucketized_value)
         return tuple(bucketized)
 
+    def _bucketize_states(self, states: np.ndarray) -> np.ndarray:
+        """Vectorized version of _bucketize_state for an array of continuous states.
+
+        :param states: Continuous states, one state per row.
+        :return: Integer array of discrete/bucketized states, one state per row.
+        """
+
+        buckets = np.asarray(self.buckets)
+        scale = (states + np.abs(self.low)) / (self.high - self.low)
+        bucketized = np.rint((buckets - 1) * scale).astype(int)
+        return np.clip(bucketized, 0, buckets - 1)
+
+    def _is_terminal(self) -> bool:
+        """Checks whether the cart or the pole is out of bounds.
+
+        :return: Whether or not the environment is in a terminal state.
+        """
+
+        x, _, theta, _ = self.state
+        return x >= self.x_max or x <= self.x_min or abs(theta) >= self.theta_max
+
     def _is_finished(self) -> bool:
         """Checks whether the environment is finished/terminated.
 
         :return: Whether or not the environment is finished/terminated.
         """
 
-        x, _, theta, _ = self.state
-        return x >= self.x_max or x <= self.x_min or \
-            abs(theta) >= self.theta_max or \
-            self.current_timestep >= self.n_timesteps
+        return self._is_terminal() or self.current_timestep >= self.n_timesteps
+
+    def is_truncated(self) -> bool:
+        """Checks whether the episode hit the time limit with the cart and pole still in bounds.
+
+        :return: Whether the episode was truncated.
+        """
+
+        return self.current_timestep >= self.n_timesteps and not self._is_terminal()
 
     def initialize(self) -> list:
         """Initializes environment/state and returns the initialized state.
@@ -97,7 +122,7 @@ class CartPole(Environment):
         self.state_history = []
         if self.store_states:
             self.state_history.append(self.state)
-        return self._bucketize_state(self.state) if self.buckets else self.state
+        return self._output_state(self._bucketize_state(self.state)) if self.buckets else self.state
 
     def next(self, action: int) -> tuple[tuple, float, bool]:
         """Applies action to the environment, moving it to the next state.
@@ -131,7 +156,8 @@ class CartPole(Environment):
         self.state = [x, d_x, theta, d_theta]
         if self.store_states:
             self.state_history.append(self.state)
-        return self._bucketize_state(self.state) if self.buckets else self.state, 1.0, self._is_finished()
+        next_state = self._output_state(self._bucketize_state(self.state)) if self.buckets else self.state
+        return next_state, 1.0, self._is_finished()
 
     def action_legal_in_state(self, action: int, state: tuple):
         """Checks whether an action is legal in a given state.
@@ -143,6 +169,31 @@ class CartPole(Environment):
 
         return action in [0, 1]
 
+    def legal_action_mask(self, state_ids: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Checks which actions are legal in every state (or in a selection of states) at once.
+        Both actions are always legal.
+
+        :param state_ids: If specified, only the states with these state ids are checked.
+        :return: Boolean array of shape state_shape + (actions,), or (len(state_ids), actions) if state_ids is
+                 specified. None if the state is not bucketized.
+        """
+
+        if self.buckets is None:
+            return None
+        if state_ids is not None:
+            return np.ones((len(state_ids), self.actions), dtype=bool)
+        return np.ones(tuple(self.buckets) + (self.actions,), dtype=bool)
+
+    def is_success(self, state, steps: int) -> bool:
+        """Checks whether a finished episode kept the pole up until the time limit.
+
+        :param state: State the episode finished in.
+        :param steps: Number of steps taken in the episode.
+        :return: Whether the episode was a success.
+        """
+
+        return steps >= self.n_timesteps
+
     @property
     def state_shape(self) -> tuple:
         """The shape of the state space
@@ -164,6 +215,8 @@ class CartPole(Environment):
     def visualize(self, vis_sleep: float = 1.0) -> None:
         """Visualizes the state history."""
 
+        from matplotlib import pyplot as plt  # Only loaded when visualizing
+
         thetas = np.array(self.state_history)[:, 2]
         plt.plot(thetas)
         plt.title(f'Epsilon=0 run in {self.__class__.__name__}')
@@ -1,4 +1,9 @@
 from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+from environments.transition_model import TransitionModel
 
 
 class Environment(ABC):
@@ -7,6 +12,9 @@ class Environment(ABC):
     Interface for environments:
     * State is a tuple.
         The interface should be a tuple even if the internals of the environment deals with one dimension.
+        If flat_states is set, the state is instead emitted as a single integer state id (the tuple raveled
+        according to state_shape). Tables can be indexed directly by the id, avoiding tuple allocation and
+        multi-axis indexing. state_id() and state_tuple() convert between the two forms.
     * Actions is an integer.
         This should account for all possible actions, and doesn't care if actions are illegal, but the environment
         must implement functionality to check which actions are legal in given states. Applications using the
@@ -14,12 +22,61 @@ class Environment(ABC):
         are taken. Illegal actions should not move the state of the environment.
     """
 
-    def __init__(self, n_timesteps: int = 2000):
+    def __init__(self, n_timesteps: int = 2000, flat_states: bool = False):
         """
         :param n_timesteps: Max number of timesteps that can be performed before environment is terminated.
+        :param flat_states: Whether states are emitted as integer state ids instead of tuples.
         """
         self.store_states: int = False
         self.n_timesteps: int = n_timesteps
+        self.flat_states: bool = flat_states
+        self._state_strides: Optional[tuple] = None
+
+    def state_id(self, state) -> int:
+        """Converts a state to its integer state id.
+
+        :param state: State in the form of a tuple or a state id.
+        :return: The state id.
+        """
+
+        if isinstance(state, (int, np.integer)):
+            return int(state)
+        if self._state_strides is None:
+            shape = self.state_shape
+            self._state_strides = tuple(int(np.prod(shape[i + 1:])) for i in range(len(shape)))
+        state_id = 0
+        for s, stride in zip(state, self._state_strides):
+            state_id += s * stride
+        return int(state_id)
+
+    def state_tuple(self, state) -> tuple:
+        """Converts a state to tuple form.
+
+        :param state: State in the form of a tuple or a state id.
+        :return: The state as a tuple.
+        """
+
+        if isinstance(state, (int, np.integer)):
+            return tuple(int(s) for s in np.unravel_index(state, self.state_shape))
+        return tuple(state)
+
+    def _output_state(self, state: tuple):
+        """Converts a state to the form emitted by initialize() and next().
+
+        :param state: State in the form of a tuple.
+        :return: The state id if flat_states is set, otherwise the state tuple.
+        """
+
+        return self.state_id(state) if self.flat_states else state
+
+    @property
+    def n_states(self) -> int:
+        """The number of states in the state space.
+
+        :return: Product of state_shape.
+        """
+
+        return int(np.prod(self.state_shape))
 
     @abstractmethod
     def initialize(self) -> tuple:
@@ -54,6 +111,54 @@ class Environment(ABC):
 
         raise NotImplementedError('Subclasses must implement action_legal_in_state()')
 
+    def legal_action_mask(self, state_ids: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Checks which actions are legal in every state (or in a selection of states) at once.
+
+        Environments can override this with a vectorized implementation. Applications should fall back to
+        action_legal_in_state() when None is returned.
+
+        :param state_ids: If specified, only the states with these state ids are checked.
+        :return: Boolean array of shape state_shape + (actions,), or (len(state_ids), actions) if state_ids is
+                 specified. None if not implemented.
+        """
+
+        return None
+
+    def is_truncated(self) -> bool:
+        """Checks whether the episode that just finished was cut off by the time limit (n_timesteps) instead of
+        reaching a terminal state. The last state of a truncated episode is not terminal, so critics should still
+        bootstrap from its value.
+
+        Environments with a time limit should override this. An episode that reaches a terminal state on its last
+        timestep is not truncated.
+
+        :return: Whether the episode was truncated. False if not implemented.
+        """
+
+        return False
+
+    def is_success(self, state, steps: int) -> Optional[bool]:
+        """Checks whether a finished episode reached the goal of the environment, e.g. when evaluating a policy.
+
+        Environments with a notion of success can override this.
+
+        :param state: State the episode finished in, in the form emitted by next().
+        :param steps: Number of steps taken in the episode.
+        :return: Whether the episode was a success. None if not implemented.
+        """
+
+        return None
+
+    def transition_model(self) -> Optional[TransitionModel]:
+        """Builds a tabular model of the dynamics of the environment, e.g. for value iteration.
+
+        Environments with known, enumerable dynamics can override this.
+
+        :return: The transition model. None if not implemented.
+        """
+
+        return None
+
     @property
     @abstractmethod
     def state_shape(self) -> tuple:
@@ -1,7 +1,10 @@
+from typing import Optional
+
 import numpy as np
-from matplotlib import pyplot as plt
 
 from environments.environment import Environment
+from environments.gambler_simulation import GamblerSimulation
+from environments.transition_model import TransitionModel
 
 
 class Gambler(Environment):
@@ -36,6 +39,14 @@ class Gambler(Environment):
 
         return self._is_won() or self.state == 0 or self.current_timestep >= self.n_timesteps
 
+    def is_truncated(self) -> bool:
+        """Checks whether the episode hit the time limit before the gambler won or went broke.
+
+        :return: Whether the episode was truncated.
+        """
+
+        return self.current_timestep >= self.n_timesteps and not (self._is_won() or self.state == 0)
+
     def _perform_bet(self, bet: int) -> None:
         """Performs bet and updates state based on if the gambler won or lost.
 
@@ -58,7 +69,7 @@ class Gambler(Environment):
         if self.store_states:
             self.state_history.append(self.state)
 
-        return self.state,
+        return self._output_state((self.state, ))
 
     def next(self, action: int):
         """Applies action to the environment, moving it to the next state.
@@ -83,7 +94,7 @@ class Gambler(Environment):
             finished = False
         if self.store_states:
             self.state_history.append(self.state)
-        return (self.state, ), reward, finished
+        return self._output_state((self.state, )), reward, finished
 
     def action_legal_in_state(self, action: int, state: tuple):
         """Checks whether an action is legal in a given state.
@@ -96,6 +107,93 @@ class Gambler(Environment):
 
         return bet <= state[0] and bet + state[0] <= self.goal_money
 
+    def legal_action_mask(self, state_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Checks which actions are legal in every state (or in a selection of states) at once.
+
+        :param state_ids: If specified, only the states with these state ids are checked.
+        :return: Boolean array of shape state_shape + (actions,), or (len(state_ids), actions) if state_ids is
+                 specified.
+        """
+
+        money = (np.arange(self.goal_money + 1) if state_ids is None else np.asarray(state_ids))[:, None]
+        bets = np.arange(1, self.actions + 1)[None, :]
+        return (bets <= money) & (bets + money <= self.goal_money)
+
+    def is_success(self, state, steps: int) -> bool:
+        """Checks whether a finished episode was won, i.e. the gambler reached goal_money.
+
+        :param state: State the episode finished in.
+        :param steps: Number of steps taken in the episode.
+        :return: Whether the episode was a success.
+        """
+
+        return self.state_tuple(state)[0] == self.goal_money
+
+    def transition_model(self) -> TransitionModel:
+        """Builds a tabular model of the dynamics of the environment.
+
+        Every legal bet has two outcomes: win (money + bet) with probability win_probability, and loss (money - bet).
+        The next states and probabilities of every (money, bet) are model.next_states[money, bet - 1] and
+        model.probabilities[money, bet - 1], as (win, loss) pairs. Illegal bets are left out (probability zero),
+        as they do not move the state.
+
+        :return: The transition model, with outcomes (win, loss).
+        """
+
+        money = np.arange(self.goal_money + 1)[:, None]
+        bets = np.arange(1, self.actions + 1)[None, :]
+        legal = self.legal_action_mask()
+
+        next_states = np.stack([money + bets, money - bets], axis=-1)
+        next_states = np.where(legal[..., None], next_states, money[..., None])
+        probabilities = np.where(legal[..., None], [self.win_probability, 1 - self.win_probability], 0.0)
+        rewards = np.where(legal[..., None] & (next_states == self.goal_money), 100.0, 0.0)
+        terminal = (money[:, 0] == 0) | (money[:, 0] == self.goal_money)
+        return TransitionModel(next_states, probabilities, rewards, legal, terminal)
+
+    def simulate(self,
+                 policy: np.ndarray,
+                 n_episodes: int = 10000,
+                 start_money: Optional[int] = None) -> GamblerSimulation:
+        """Plays a batch of episodes with a fixed policy, all episodes at once.
+
+        Follows the rules of next(): illegal bets are punished and do not change the state, and episodes end when the
+        gambler wins, goes broke or runs out of timesteps.
+
+        :param policy: Integer array of shape (goal_money + 1,) with the action to take at each amount of money,
+                       e.g. Actor.greedy_actions().
+        :param n_episodes: Number of episodes to play.
+        :param start_money: Money at the start of each episode. Random like initialize() if not specified.
+        :return: The wins, lengths and total rewards of the episodes.
+        """
+
+        policy = np.asarray(policy)
+        if start_money is None:
+            money = np.random.randint(1, self.goal_money, n_episodes)
+        else:
+            money = np.full(n_episodes, start_money)
+        lengths = np.zeros(n_episodes, dtype=int)
+        rewards = np.zeros(n_episodes)
+        active = np.ones(n_episodes, dtype=bool)
+
+        for _ in range(self.n_timesteps):
+            indices = np.flatnonzero(active)
+            if len(indices) == 0:
+                break
+            current = money[indices]
+            bets = policy[current] + 1
+            legal = (bets <= current) & (bets + current <= self.goal_money)
+            won_bet = np.random.random(len(indices)) < self.win_probability
+            current = current + np.where(legal, np.where(won_bet, bets, -bets), 0)
+
+            is_won = current == self.goal_money
+            money[indices] = current
+            lengths[indices] += 1
+            rewards[indices] += np.where(legal, np.where(is_won, 100, 0), -10)
+            active[indices] = ~(legal & (is_won | (current == 0)))
+
+        return GamblerSimulation(money == self.goal_money, lengths, rewards)
+
     @property
     def state_shape(self) -> tuple:
         """The shape of the state space
@@ -117,6 +215,8 @@ class Gambler(Environment):
     def visualize(self, vis_sleep: float = 1.0) -> None:
         """Visualizes the state history."""
 
+        from matplotlib import pyplot as plt  # Only loaded when visualizing
+
         plt.plot(np.array(self.state_history))
         plt.title(f'Epsilon=0 run in {self.__class__.__name__}')
         plt.xlabel('Timestep')
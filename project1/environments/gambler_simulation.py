@@ -0,0 +1,28 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class GamblerSimulation:
+    """Outcome of playing a batch of Gambler episodes with a fixed policy (see Gambler.simulate())."""
+
+    wins: np.ndarray  # Whether each episode was won, (n_episodes,)
+    episode_lengths: np.ndarray  # Number of steps of each episode, (n_episodes,)
+    total_rewards: np.ndarray  # Sum of the rewards of each episode, (n_episodes,)
+
+    @property
+    def win_rate(self) -> float:
+        return float(np.mean(self.wins))
+
+    @property
+    def mean_length(self) -> float:
+        return float(np.mean(self.episode_lengths))
+
+    def length_distribution(self) -> np.ndarray:
+        """Counts the episodes of every length.
+
+        :return: Array where entry i is the fraction of episodes that lasted i steps.
+        """
+
+        return np.bincount(self.episode_lengths) / len(self.episode_lengths)
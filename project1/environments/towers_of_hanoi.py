@@ -1,15 +1,20 @@
 import time
+from typing import Optional
 
-from prettytable import PrettyTable
+import numpy as np
 
 from environments.environment import Environment
+from environments.transition_model import TransitionModel
 
 
 class TowersOfHanoi(Environment):
-    def __init__(self, n_disks: int = 3, n_pegs: int = 3, *args, **kwargs):
+    def __init__(self, n_disks: int = 3, n_pegs: int = 3, precompute_transitions: bool = False, *args, **kwargs):
         """
         :param n_disks: Number of disks.
         :param n_pegs: Number of pegs.
+        :param precompute_transitions: If True, the next state, legality and terminal flag of every SAP are
+                                       computed once, so that next() only does table lookups. Takes memory and
+                                       time proportional to n_pegs ** n_disks * actions.
         """
 
         super().__init__(*args, **kwargs)
@@ -21,6 +26,27 @@ class TowersOfHanoi(Environment):
 
         self.state_history = []
 
+        # Transition tables, indexed by state id (the state read as a base n_pegs number) and action
+        self._current_state_id: int = 0
+        self._next_state_ids: Optional[list[list[int]]] = None
+        self._legal: Optional[list[list[bool]]] = None
+        self._terminal: Optional[list[bool]] = None
+        self._state_tuples: Optional[list[tuple]] = None
+        if precompute_transitions:
+            self._precompute_transitions()
+
+    def _precompute_transitions(self) -> None:
+        """Computes the transition tables from the transition model. They are stored as (nested) lists, as
+        indexing those with python integers is faster than indexing arrays.
+        """
+
+        model = self.transition_model()
+        self._next_state_ids = model.next_states[..., 0].tolist()
+        self._legal = model.legal.tolist()
+        self._terminal = model.terminal.tolist()
+        states = np.indices(self.state_shape).reshape(self.n_disks, -1).T
+        self._state_tuples = [tuple(state) for state in states.tolist()]
+
     def _get_moves(self) -> list:
         """Get all possible moves for the towers of hanoi game given number of disks and pegs.
 
@@ -47,6 +73,19 @@ class TowersOfHanoi(Environment):
         state[from_disk] = to_peg
         self.state = tuple(state)
 
+    def _top_disks(self, states: np.ndarray) -> np.ndarray:
+        """Finds the top (smallest) disk on every peg for an array of states.
+
+        :param states: Integer array of states, one state per row.
+        :return: Integer array of shape (len(states), n_pegs). Empty pegs are given n_disks.
+        """
+
+        rows = np.arange(len(states))
+        top = np.full((len(states), self.n_pegs), self.n_disks)
+        for disk in reversed(range(self.n_disks)):
+            top[rows, states[:, disk]] = disk
+        return top
+
     def _is_won(self) -> bool:
         """Checks whether the current state is won.
 
@@ -62,6 +101,14 @@ class TowersOfHanoi(Environment):
             prev = s
         return True
 
+    def is_truncated(self) -> bool:
+        """Checks whether the episode hit the time limit before the puzzle was solved.
+
+        :return: Whether the episode was truncated.
+        """
+
+        return self.current_timestep >= self.n_timesteps and not self._is_won()
+
     def initialize(self) -> tuple:
         """Initializes environment/state and returns the initialized state.
 
@@ -70,10 +117,11 @@ class TowersOfHanoi(Environment):
 
         self.current_timestep = 0
         self.state = (0, ) * self.n_disks
+        self._current_state_id = 0
         self.state_history = []
         if self.store_states:
             self.state_history.append(self.state)
-        return self.state
+        return self._output_state(self.state)
 
     def next(self, action: int) -> tuple[tuple, float, bool]:
         """Applies action to the environment, moving it to the next state.
@@ -85,6 +133,9 @@ class TowersOfHanoi(Environment):
                     finished: boolean specifying if the environment has reached some terminal condition
         """
 
+        if self._next_state_ids is not None:
+            return self._next_precomputed(action)
+
         self.current_timestep += 1
         if self.action_legal_in_state(action, self.state):
             from_peg, to_peg = self.moves[action]
@@ -98,7 +149,31 @@ class TowersOfHanoi(Environment):
 
         if self.store_states:
             self.state_history.append(self.state)
-        return self.state, reward, finished
+        return self._output_state(self.state), reward, finished
+
+    def _next_precomputed(self, action: int) -> tuple[tuple, float, bool]:
+        """Like next(), but looks the transition up in the precomputed transition tables.
+
+        :param action: The action to perform
+        :return: (next_state, reward, finished)
+        """
+
+        self.current_timestep += 1
+        state_id = self._current_state_id
+        if self._legal[state_id][action]:
+            state_id = self._next_state_ids[state_id][action]
+            self._current_state_id = state_id
+            self.state = self._state_tuples[state_id]
+            is_won = self._terminal[state_id]
+            reward = 100 if is_won else 0
+            finished = is_won or self.current_timestep >= self.n_timesteps
+        else:
+            reward = -1
+            finished = False
+
+        if self.store_states:
+            self.state_history.append(self.state)
+        return (state_id if self.flat_states else self.state), reward, finished
 
     def action_legal_in_state(self, action: int, state: tuple):
         """Checks whether an action is legal in a given state.
@@ -108,6 +183,9 @@ class TowersOfHanoi(Environment):
         :return: Whether the action is legal in the given state.
         """
 
+        if self._legal is not None:
+            return self._legal[self.state_id(state)][action]
+
         from_peg, to_peg = self.moves[action]
         if from_peg not in state:
             return False
@@ -118,6 +196,61 @@ class TowersOfHanoi(Environment):
 
         return True
 
+    def legal_action_mask(self, state_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Checks which actions are legal in every state (or in a selection of states) at once.
+
+        A move is legal if the top disk of from_peg is smaller than the top disk of to_peg (or to_peg is empty).
+
+        :param state_ids: If specified, only the states with these state ids are checked.
+        :return: Boolean array of shape state_shape + (actions,), or (len(state_ids), actions) if state_ids is
+                 specified.
+        """
+
+        if state_ids is None:
+            states = np.indices(self.state_shape, dtype=np.int8).reshape(self.n_disks, -1).T
+        else:
+            states = np.stack(np.unravel_index(state_ids, self.state_shape), axis=1)
+        top = self._top_disks(states)
+        from_pegs, to_pegs = np.array(self.moves).T
+        legal = top[:, from_pegs] < top[:, to_pegs]
+        return legal if state_ids is not None else legal.reshape(self.state_shape + (self.actions,))
+
+    def is_success(self, state, steps: int) -> bool:
+        """Checks whether a finished episode moved all disks to the last peg (rather than running out of time).
+
+        :param state: State the episode finished in.
+        :param steps: Number of steps taken in the episode.
+        :return: Whether the episode was a success.
+        """
+
+        return all(peg == self.n_pegs - 1 for peg in self.state_tuple(state))
+
+    def transition_model(self) -> TransitionModel:
+        """Builds a tabular model of the dynamics of the environment.
+
+        Moves are deterministic, so there is a single outcome per SAP. Illegal moves are left out (probability zero),
+        as they do not move the state.
+
+        :return: The transition model.
+        """
+
+        states = np.indices(self.state_shape).reshape(self.n_disks, -1).T
+        rows = np.arange(len(states))
+        top = self._top_disks(states)
+        from_pegs, to_pegs = np.array(self.moves).T
+        legal = top[:, from_pegs] < top[:, to_pegs]
+
+        next_states = np.repeat(rows[:, None], self.actions, axis=1)
+        for action, (from_peg, to_peg) in enumerate(self.moves):
+            moved = states[legal[:, action]].copy()
+            moved[np.arange(len(moved)), top[legal[:, action], from_peg]] = to_peg
+            next_states[legal[:, action], action] = np.ravel_multi_index(moved.T, self.state_shape)
+
+        terminal = np.all(states == self.n_pegs - 1, axis=1)
+        rewards = np.where(terminal[next_states], 100.0, 0.0)
+        return TransitionModel(next_states[..., None], legal[..., None].astype(float), rewards[..., None], legal,
+                               terminal)
+
     @property
     def state_shape(self) -> tuple:
         """The shape of the state space.
@@ -138,6 +271,8 @@ class TowersOfHanoi(Environment):
 
     def visualize(self, vis_sleep: float = 1.0) -> None:
         """Visualizes the state history."""
+        from prettytable import PrettyTable  # Only loaded when visualizing
+
         print(f'Epsilon=0 run in {self.__class__.__name__}')
         for i, state in enumerate(self.state_history):
             n_pegs = self.state_history[-1][0] + 1
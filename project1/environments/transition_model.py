@@ -0,0 +1,26 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class TransitionModel:
+    """Tabular model of the dynamics of an environment, indexed by state id, action and outcome.
+
+    Each state-action pair (SAP) has n_outcomes possible outcomes (e.g. win/loss in Gambler, a single outcome in
+    deterministic environments). Outcomes that cannot happen have probability zero. Time limits are not modeled.
+    """
+
+    next_states: np.ndarray  # Next state id, (n_states, actions, n_outcomes)
+    probabilities: np.ndarray  # Probability of each outcome, (n_states, actions, n_outcomes)
+    rewards: np.ndarray  # Reward for each outcome, (n_states, actions, n_outcomes)
+    legal: np.ndarray  # Whether each SAP is legal, (n_states, actions)
+    terminal: np.ndarray  # Whether episodes end in each state, (n_states,)
+
+    @property
+    def n_states(self) -> int:
+        return self.next_states.shape[0]
+
+    @property
+    def actions(self) -> int:
+        return self.next_states.shape[1]
@@ -0,0 +1,65 @@
+import numpy as np
+
+from environments.cartpole import CartPole
+from environments.vector_environment import VectorEnvironment
+
+
+class VectorCartPole(VectorEnvironment, CartPole):
+    """CartPole that simulates n_envs carts at once.
+
+    Takes the same parameters as CartPole (plus n_envs), and applies the same Euler physics and termination rules
+    to all carts using NumPy arrays.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.states: np.ndarray = np.zeros((self.n_envs, 4))  # One (x, d_x, theta, d_theta) per row
+
+    def _reset(self, mask: np.ndarray) -> None:
+        """Places the selected carts in the middle of the track with a random pole angle.
+
+        :param mask: Boolean array of shape (n_envs,) selecting the carts to initialize.
+        """
+
+        n = int(np.count_nonzero(mask))
+        self.states[mask] = 0.0
+        self.states[mask, 0] = (self.x_max + self.x_min) / 2
+        self.states[mask, 2] = np.random.uniform(-self.theta_max, self.theta_max, n)
+
+    def _step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Applies the bang-force given by actions to every cart.
+
+        :param actions: Integer array of shape (n_envs,).
+        :return: (rewards, finished) arrays of shape (n_envs,).
+        """
+
+        x, d_x, theta, d_theta = self.states.T
+        B = np.where(actions == 1, self.F, -self.F)
+        cos_theta = np.cos(theta)
+        sin_theta = np.sin(theta)
+
+        # dd_theta
+        term1 = cos_theta * ((-B - self.m_p * self.L * d_theta * sin_theta) / (self.m_p + self.m_c))
+        term2 = (cos_theta ** 2) * (self.m_p / (self.m_p + self.m_c))
+        dd_theta = (self.g * sin_theta + term1) / (self.L * ((4 / 3) - term2))
+
+        # dd_x
+        term3 = (d_theta ** 2) * sin_theta - dd_theta * cos_theta
+        dd_x = (B + self.m_p * self.L * term3) / (self.m_p + self.m_c)
+
+        # Update (x, d_x, theta and d_theta are views into self.states)
+        x += self.timestep_delta * d_x
+        d_x += self.timestep_delta * dd_x
+        theta += self.timestep_delta * d_theta
+        d_theta += self.timestep_delta * dd_theta
+
+        finished = (x >= self.x_max) | (x <= self.x_min) | (np.abs(theta) >= self.theta_max)
+        return np.ones(self.n_envs), finished
+
+    def _observe(self) -> np.ndarray:
+        """Returns the states of all carts, bucketized if buckets are specified.
+
+        :return: Array of shape (n_envs, 4).
+        """
+
+        return self._bucketize_states(self.states) if self.buckets else self.states.copy()
@@ -0,0 +1,142 @@
+from abc import abstractmethod
+from typing import Callable
+
+import numpy as np
+
+from environments.environment import Environment
+
+
+class VectorEnvironment(Environment):
+    """Abstract environment class for stepping several independent instances of an environment at once.
+
+    Interface for vector environments:
+    * States is an array with one row per instance.
+        Bucketized/discrete states are returned as integer arrays of shape (n_envs, len(state_shape)), or as integer
+        state ids of shape (n_envs,) if flat_states is set.
+    * Actions is an integer array with one action per instance.
+    * Finished instances are reset automatically.
+        The states returned by next() are the initial states of the new episodes for those instances, while the
+        states they finished in are available in terminal_states.
+
+    Concrete vector environments are meant to be combined with the environment they vectorize, e.g.
+    class VectorCartPole(VectorEnvironment, CartPole), so that parameters, state_shape, actions and legality checks
+    are shared with the scalar environment.
+    """
+
+    def __init__(self, n_envs: int = 16, *args, **kwargs):
+        """
+        :param n_envs: Number of environment instances that are stepped at once.
+        """
+
+        super().__init__(*args, **kwargs)
+        self.n_envs: int = n_envs
+        self.timesteps: np.ndarray = np.zeros(n_envs, dtype=int)
+        self.terminal_states: np.ndarray = np.empty((0,))
+
+    @abstractmethod
+    def _reset(self, mask: np.ndarray) -> None:
+        """Initializes the instances selected by mask.
+
+        :param mask: Boolean array of shape (n_envs,) selecting the instances to initialize.
+        """
+
+        raise NotImplementedError('Subclasses must implement _reset()')
+
+    @abstractmethod
+    def _step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Applies one action to every instance.
+
+        :param actions: Integer array of shape (n_envs,).
+        :return: (rewards, finished) arrays of shape (n_envs,). Time limits are handled by next().
+        """
+
+        raise NotImplementedError('Subclasses must implement _step()')
+
+    @abstractmethod
+    def _observe(self) -> np.ndarray:
+        """Returns the states of all instances in the form exposed to the learner.
+
+        :return: Array with one state per row.
+        """
+
+        raise NotImplementedError('Subclasses must implement _observe()')
+
+    def _output_states(self, states: np.ndarray) -> np.ndarray:
+        """Converts observed states to the form emitted by initialize() and next().
+
+        :param states: Array of states, one state per row.
+        :return: Array of state ids if flat_states is set, otherwise states.
+        """
+
+        return np.ravel_multi_index(states.T, self.state_shape) if self.flat_states else states
+
+    def initialize(self) -> np.ndarray:
+        """Initializes all instances and returns their states.
+
+        :return: The initial states.
+        """
+
+        self.timesteps[:] = 0
+        self._reset(np.ones(self.n_envs, dtype=bool))
+        return self._output_states(self._observe())
+
+    def next(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Applies one action to every instance, resetting the instances that finished.
+
+        :param actions: Integer array of shape (n_envs,) with the action to perform in each instance.
+        :return: (next_states, rewards, finished)
+                    next_states: the current states of the instances (already reset where finished)
+                    rewards: numerical rewards for moving to the states
+                    finished: boolean array specifying which instances reached a terminal condition
+        """
+
+        self.timesteps += 1
+        rewards, finished = self._step(np.asarray(actions))
+        finished |= self.timesteps >= self.n_timesteps
+
+        states = self._output_states(self._observe())
+        self.terminal_states = states[finished]
+        if finished.any():
+            self.timesteps[finished] = 0
+            self._reset(finished)
+            states = self._output_states(self._observe())
+        return states, rewards, finished
+
+    def rollout(self,
+                policy: Callable[[np.ndarray], np.ndarray],
+                n_episodes: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Runs n_episodes episodes over all instances.
+
+        Each instance is given a fixed quota of episodes up front (n_episodes split as evenly as possible), and
+        stepping continues until every instance has finished its quota. Episodes an instance starts beyond its quota
+        are discarded. Keeping the first n_episodes to finish instead would leave out long episodes that are still
+        running, biasing the stats towards short ones.
+
+        :param policy: Callable mapping an array of states to an array of actions.
+        :param n_episodes: Number of episodes to collect.
+        :return: (steps, rewards, final_states) arrays with the length, total reward and the state each finished
+                 episode ended in (one per row).
+        """
+
+        steps, rewards, final_states = [], [], []
+        episode_steps = np.zeros(self.n_envs, dtype=int)
+        episode_rewards = np.zeros(self.n_envs)
+        quotas = np.full(self.n_envs, n_episodes // self.n_envs)
+        quotas[:n_episodes % self.n_envs] += 1
+        n_finished = np.zeros(self.n_envs, dtype=int)
+
+        states = self.initialize()
+        while (n_finished < quotas).any():
+            states, step_rewards, finished = self.next(policy(states))
+            episode_steps += 1
+            episode_rewards += step_rewards
+            if finished.any():
+                accepted = finished & (n_finished < quotas)
+                steps.append(episode_steps[accepted])
+                rewards.append(episode_rewards[accepted])
+                final_states.append(self.terminal_states[accepted[finished]])
+                episode_steps[finished] = 0
+                episode_rewards[finished] = 0
+                n_finished += accepted
+
+        return np.concatenate(steps), np.concatenate(rewards), np.concatenate(final_states)
@@ -0,0 +1,48 @@
+import numpy as np
+
+from environments.gambler import Gambler
+from environments.vector_environment import VectorEnvironment
+
+
+class VectorGambler(VectorEnvironment, Gambler):
+    """Gambler that plays n_envs independent games at once.
+
+    Takes the same parameters as Gambler (plus n_envs). Rewards, legality and termination follow Gambler.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.states: np.ndarray = np.zeros(self.n_envs, dtype=int)  # Money of each gambler
+
+    def _reset(self, mask: np.ndarray) -> None:
+        """Gives the selected gamblers a random amount of starting money.
+
+        :param mask: Boolean array of shape (n_envs,) selecting the games to initialize.
+        """
+
+        self.states[mask] = np.random.randint(1, self.goal_money, int(np.count_nonzero(mask)))
+
+    def _step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Performs one bet in every game. Illegal bets are punished and do not change the state.
+
+        :param actions: Integer array of shape (n_envs,).
+        :return: (rewards, finished) arrays of shape (n_envs,).
+        """
+
+        bets = actions + 1
+        legal = (bets <= self.states) & (bets + self.states <= self.goal_money)
+        won_bet = np.random.random(self.n_envs) < self.win_probability
+        self.states += np.where(legal, np.where(won_bet, bets, -bets), 0)
+
+        is_won = self.states == self.goal_money
+        rewards = np.where(legal, np.where(is_won, 100, 0), -10)
+        finished = legal & (is_won | (self.states == 0))
+        return rewards, finished
+
+    def _observe(self) -> np.ndarray:
+        """Returns the states of all games.
+
+        :return: Array of shape (n_envs, 1).
+        """
+
+        return self.states[:, None].copy()
@@ -0,0 +1,54 @@
+import numpy as np
+
+from environments.towers_of_hanoi import TowersOfHanoi
+from environments.vector_environment import VectorEnvironment
+
+
+class VectorTowersOfHanoi(VectorEnvironment, TowersOfHanoi):
+    """TowersOfHanoi that plays n_envs independent games at once.
+
+    Takes the same parameters as TowersOfHanoi (plus n_envs). Rewards, legality and termination follow
+    TowersOfHanoi.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.states: np.ndarray = np.zeros((self.n_envs, self.n_disks), dtype=int)  # (smallest, ..., largest)
+        self.move_array: np.ndarray = np.array(self.moves, dtype=int)  # (from_peg, to_peg) per action
+
+    def _reset(self, mask: np.ndarray) -> None:
+        """Stacks all disks of the selected games on the first peg.
+
+        :param mask: Boolean array of shape (n_envs,) selecting the games to initialize.
+        """
+
+        self.states[mask] = 0
+
+    def _step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Performs one move in every game. Illegal moves are punished and do not change the state.
+
+        A move is legal if the top disk of from_peg is smaller than the top disk of to_peg (or to_peg is empty).
+
+        :param actions: Integer array of shape (n_envs,).
+        :return: (rewards, finished) arrays of shape (n_envs,).
+        """
+
+        rows = np.arange(self.n_envs)
+        from_pegs, to_pegs = self.move_array[actions].T
+        top = self._top_disks(self.states)
+        from_disks = top[rows, from_pegs]
+        legal = from_disks < top[rows, to_pegs]
+        self.states[rows[legal], from_disks[legal]] = to_pegs[legal]
+
+        is_won = np.all(self.states == self.n_pegs - 1, axis=1)
+        rewards = np.where(legal, np.where(is_won, 100, 0), -1)
+        finished = legal & is_won
+        return rewards, finished
+
+    def _observe(self) -> np.ndarray:
+        """Returns the states of all games.
+
+        :return: Array of shape (n_envs, n_disks).
+        """
+
+        return self.states.copy()
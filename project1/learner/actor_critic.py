@@ -1,11 +1,45 @@
-from typing import Optional
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 from environments.environment import Environment
+from environments.vector_environment import VectorEnvironment
 from learner.actors.actor import Actor
 from learner.critics.critic import Critic
+from learner.utils.checkpoint import file_digest, save_arrays, load_arrays
+from learner.utils.evaluation import EVALUATION_STATS, summarize_episodes
+from learner.utils.metrics import MetricsSink
+from learner.utils.profiler import PhaseProfiler
+from learner.utils.stopping import StoppingCriterion
+from utils.seeding import get_rng_state, set_rng_state, set_seed
+
+_evaluated: Optional['ActorCritic'] = None  # The ActorCritic evaluated by a forked evaluation worker
+
+
+def _set_evaluated(actor_critic: 'ActorCritic') -> None:
+    """Initializer of evaluation workers.
+
+    :param actor_critic: The ActorCritic to evaluate.
+    """
+
+    global _evaluated
+    _evaluated = actor_critic
+
+
+def _evaluate_in_worker(seed: int, n_episodes: int) -> tuple[np.ndarray, np.ndarray, list[Optional[bool]]]:
+    """Runs greedy episodes in an evaluation worker.
+
+    :param seed: Seed for the random number generators of the worker.
+    :param n_episodes: Number of episodes to run.
+    :return: (steps, rewards, successes) of each episode.
+    """
+
+    set_seed(seed)
+    return _evaluated._run_greedy_episodes(n_episodes)
 
 
 class ActorCritic:
@@ -26,39 +60,367 @@ class ActorCritic:
         self.critic: Critic = critic
 
         self.steps: Optional[np.ndarray] = None
+        self.stop_reason: Optional[str] = None
+        self.start_episode: int = 0  # Episode the last fit started (or resumed) from
 
-    def fit(self, n_episodes: int = 300) -> None:
-        """Fits the tables/networks of the actors and critic by learning from the environment.
+    def save_checkpoint(self, folder: str, episode: int) -> None:
+        """Saves everything needed to continue fitting from the next episode.
 
-        :param n_episodes: Number of episodes to run the environment.
-        :return:
+        The actor and critic save their own tables/networks, while the fit progress (episode, steps) and the state
+        of the random number generators are saved to folder/fit.npz. Each file is replaced atomically, but the set of
+        files is not, so fit.npz is written last and holds digests of the files of the actor and critic. If a save
+        is interrupted in between, load_checkpoint() detects that the files do not belong together.
+
+        :param folder: Checkpoint folder.
+        :param episode: The episode the fit should continue from.
         """
 
-        self.steps = np.zeros(n_episodes, dtype=int)
-        for episode in range(n_episodes):
-            self.actor.reset()
-            self.critic.reset()
+        os.makedirs(folder, exist_ok=True)
+        paths = self.actor.save(folder) + self.critic.save(folder)
+        save_arrays(os.path.join(folder, 'fit.npz'), {'episode': np.array(episode),
+                                                      'steps': self.steps,
+                                                      'files': np.array([os.path.basename(p) for p in paths]),
+                                                      'digests': np.array([file_digest(p) for p in paths]),
+                                                      **get_rng_state()})
 
-            state = self.environment.initialize()
+    def load_checkpoint(self, folder: str) -> int:
+        """Loads a checkpoint saved by save_checkpoint().
+
+        :param folder: Checkpoint folder.
+        :return: The episode the fit should continue from.
+        """
+
+        progress = load_arrays(os.path.join(folder, 'fit.npz'))
+        for file, digest in zip(progress['files'], progress['digests']):
+            path = os.path.join(folder, str(file))
+            if not os.path.exists(path) or file_digest(path) != str(digest):
+                raise ValueError(f'Checkpoint in {folder} is inconsistent: {file} does not match fit.npz. '
+                                 f'Was the last save interrupted?')
+        self.actor.load(folder)
+        self.critic.load(folder)
+        self.steps = progress['steps']
+        set_rng_state(progress)
+        return int(progress['episode'])
+
+    def _run_episode(self, episode: int, profiler: Optional[PhaseProfiler] = None) -> tuple[int, float]:
+        """Runs one episode, updating the actor and critic at every step.
+
+        :param episode: Episode number.
+        :param profiler: If specified, the time spent in each phase of the step is recorded in the profiler.
+        :return: (steps, total_reward)
+        """
 
+        # Bound once per episode. When profiling, each phase is replaced by a timed wrapper, so the loop is the same
+        # either way and costs nothing extra without a profiler.
+        choose_action = self.actor.choose_action
+        environment_next = self.environment.next
+        get_delta = self.critic.get_delta
+        update_v = self.critic.update_v
+        update_pi = self.actor.update_pi
+        if profiler is not None:
+            choose_action = profiler.timed(PhaseProfiler.CHOOSE_ACTION, choose_action)
+            environment_next = profiler.timed(PhaseProfiler.ENVIRONMENT_NEXT, environment_next)
+            get_delta = profiler.timed(PhaseProfiler.GET_DELTA, get_delta)
+            update_v = profiler.timed(PhaseProfiler.UPDATE_V, update_v)
+            update_pi = profiler.timed(PhaseProfiler.UPDATE_PI, update_pi)
+            profiler.start_episode()
+
+        self.actor.reset()
+        self.critic.reset()
+
+        state = self.environment.initialize()
+
+        steps = 0
+        total_reward = 0.0
+        finished = False
+        while not finished:
+            steps += 1
+            action = choose_action(state, episode)
+
+            next_state, reward, finished = environment_next(action)
+            total_reward += reward
+            terminal = finished and not self.environment.is_truncated()  # Time limits do not end the task
+
+            delta = get_delta(state, reward, next_state, terminal)
+            update_v(delta, episode)
+            update_pi(float(delta), episode)
+
+            state = next_state
+
+        if profiler is not None:
+            profiler.end_episode(episode, steps)
+        return steps, total_reward
+
+    def evaluate(self,
+                 n_episodes: int = 10,
+                 n_workers: int = 1,
+                 vector_environment: Optional[VectorEnvironment] = None) -> dict:
+        """Runs episodes with the greedy policy, without updating the actor or critic.
+
+        The episodes are run in this process, split over n_workers forked processes, or stepped all at once in
+        vector_environment. The random number generators are restored afterwards, so evaluating during a fit does
+        not change it.
+
+        :param n_episodes: Number of episodes to run.
+        :param n_workers: Number of worker processes. Workers are forked, so this is only supported on platforms with
+                          the fork start method.
+        :param vector_environment: If specified, the episodes are run in this vectorized version of the environment
+                                   (e.g. a VectorCartPole for a CartPole) instead. Requires a bucketized state space.
+        :return: Aggregate stats of the episodes, see learner/utils/evaluation.py: mean_steps, percentiles of the
+                 steps, mean_reward, success_rate, ...
+        """
+
+        rng_state = get_rng_state()
+        try:
+            if vector_environment is not None:
+                steps, rewards, successes = self._run_vectorized_greedy_episodes(n_episodes, vector_environment)
+            elif n_workers > 1:
+                steps, rewards, successes = self._run_parallel_greedy_episodes(n_episodes, n_workers)
+            else:
+                steps, rewards, successes = self._run_greedy_episodes(n_episodes)
+        finally:
+            set_rng_state(rng_state)
+        return summarize_episodes(steps, rewards, successes)
+
+    def _run_greedy_episodes(self, n_episodes: int) -> tuple[np.ndarray, np.ndarray, list[Optional[bool]]]:
+        """Runs greedy episodes in the environment.
+
+        :param n_episodes: Number of episodes to run.
+        :return: (steps, rewards, successes) of each episode.
+        """
+
+        steps = np.zeros(n_episodes, dtype=int)
+        rewards = np.zeros(n_episodes)
+        successes = []
+        for i in range(n_episodes):
+            state = self.environment.initialize()
             finished = False
             while not finished:
-                self.steps[episode] += 1
-                action = self.actor.choose_action(state, episode)
+                steps[i] += 1
+                state, reward, finished = self.environment.next(self.actor.choose_action(state))
+                rewards[i] += reward
+            successes.append(self.environment.is_success(state, int(steps[i])))
+        return steps, rewards, successes
+
+    def _run_parallel_greedy_episodes(self,
+                                      n_episodes: int,
+                                      n_workers: int) -> tuple[np.ndarray, np.ndarray, list[Optional[bool]]]:
+        """Runs greedy episodes split over forked worker processes, each with its own seed.
+
+        :param n_episodes: Number of episodes to run.
+        :param n_workers: Number of worker processes.
+        :return: (steps, rewards, successes) of each episode.
+        """
+
+        chunks = [len(chunk) for chunk in np.array_split(np.arange(n_episodes), n_workers) if len(chunk) > 0]
+        seeds = np.random.randint(2 ** 31, size=len(chunks))
+        with ProcessPoolExecutor(max_workers=len(chunks), mp_context=mp.get_context('fork'),
+                                 initializer=_set_evaluated, initargs=(self,)) as executor:
+            results = list(executor.map(_evaluate_in_worker, seeds.tolist(), chunks))
+        return (np.concatenate([steps for steps, _, _ in results]),
+                np.concatenate([rewards for _, rewards, _ in results]),
+                [success for _, _, successes in results for success in successes])
+
+    def _run_vectorized_greedy_episodes(self,
+                                        n_episodes: int,
+                                        vector_environment: VectorEnvironment
+                                        ) -> tuple[np.ndarray, np.ndarray, list[Optional[bool]]]:
+        """Runs greedy episodes in a vectorized version of the environment.
+
+        :param n_episodes: Number of episodes to run.
+        :param vector_environment: The vector environment.
+        :return: (steps, rewards, successes) of each episode.
+        """
+
+        state_shape = self.environment.state_shape
+        if vector_environment.state_shape != state_shape or vector_environment.actions != self.environment.actions:
+            raise ValueError('The vector environment must have the same state space and actions as the environment.')
+        greedy_actions = self.actor.greedy_actions().ravel()
+
+        def policy(states: np.ndarray) -> np.ndarray:
+            state_ids = states if vector_environment.flat_states else np.ravel_multi_index(states.T, state_shape)
+            return greedy_actions[state_ids]
+
+        steps, rewards, final_states = vector_environment.rollout(policy, n_episodes)
+        successes = [vector_environment.is_success(state, int(n)) for state, n in zip(final_states, steps)]
+        return steps, rewards, successes
+
+    def _evaluation_stats(self,
+                          n_finished: int,
+                          evaluation_interval: Optional[int],
+                          evaluation_params: Optional[dict]) -> dict:
+        """Evaluates the greedy policy every evaluation_interval episodes of a fit.
+
+        :param n_finished: Number of episodes finished in the fit.
+        :param evaluation_interval: Number of episodes between each evaluation. No evaluation if None.
+        :param evaluation_params: Keyword arguments to evaluate().
+        :return: The stats of the evaluation, prefixed with eval_. In episodes without an evaluation, the same
+                 stats are None, so that every episode has the same stats.
+        """
+
+        if evaluation_interval is None:
+            return {}
+        if n_finished % evaluation_interval != 0:
+            return {f'eval_{stat}': None for stat in EVALUATION_STATS}
+        return {f'eval_{stat}': value for stat, value in self.evaluate(**(evaluation_params or {})).items()}
+
+    def _episode_stats(self, episode: int, steps: int, total_reward: float, wall_time: float) -> dict:
+        """Collects the stats of a finished episode.
+
+        :param episode: Episode number.
+        :param steps: Number of steps taken.
+        :param total_reward: Sum of the rewards of the episode.
+        :param wall_time: Seconds spent on the episode.
+        :return: Stats by name.
+        """
 
-                next_state, reward, finished = self.environment.next(action)
+        return {'episode': episode,
+                'steps': steps,
+                'total_reward': float(total_reward),
+                'epsilon': float(self.actor.epsilon(episode)),
+                'actor_learning_rate': float(self.actor.learning_rate(episode)),
+                'critic_learning_rate': float(self.critic.learning_rate(episode)),
+                'wall_time': wall_time}
 
-                delta = self.critic.get_delta(state, reward, next_state)
-                self.critic.update_v(delta, episode)
-                self.actor.update_pi(delta.item(), episode)
+    def _precompute_schedules(self, n_episodes: int) -> None:
+        """Computes the learning rates and epsilon for every episode of the fit up front.
 
-                state = next_state
+        :param n_episodes: Number of episodes in the fit.
+        """
+
+        self.actor.learning_rate.precompute(n_episodes)
+        self.actor.epsilon.precompute(n_episodes)
+        self.critic.learning_rate.precompute(n_episodes)
+
+    def fit_iter(self,
+                 n_episodes: int = 300,
+                 checkpoint_folder: Optional[str] = None,
+                 checkpoint_interval: int = 100,
+                 resume: bool = False,
+                 profiler: Optional[PhaseProfiler] = None,
+                 stopping_criteria: Optional[list[StoppingCriterion]] = None,
+                 evaluation_interval: Optional[int] = None,
+                 evaluation_params: Optional[dict] = None) -> Iterator[dict]:
+        """Fits the tables/networks of the actor and critic, yielding the stats of each episode as it finishes.
+
+        Only the number of steps of each episode is kept (in steps), so callers can stream the stats elsewhere
+        without the whole history being held in memory. If a stopping criterion is met, the fit ends after that
+        episode, stop_reason is set and steps is truncated to the episodes that were run.
+
+        :param n_episodes: Number of episodes to run the environment.
+        :param checkpoint_folder: If specified, a checkpoint is saved here every checkpoint_interval episodes and
+                                  at the end of the fit.
+        :param checkpoint_interval: Number of episodes between each checkpoint.
+        :param resume: Whether to continue from the checkpoint in checkpoint_folder (if there is one).
+        :param profiler: If specified, the time spent in each phase of the fit loop is recorded in the profiler.
+        :param stopping_criteria: Criteria that are checked after every episode to end the fit early.
+        :param evaluation_interval: If specified, the greedy policy is evaluated every evaluation_interval episodes.
+        :param evaluation_params: Keyword arguments to evaluate(), e.g. n_episodes.
+        :return: Iterator over the stats of each episode: episode, steps, total_reward, epsilon,
+                 actor_learning_rate, critic_learning_rate and wall_time (seconds), plus the stats of evaluate()
+                 prefixed with eval_ if evaluation_interval is specified.
+        """
+
+        start_episode = 0
+        if resume and checkpoint_folder is not None and os.path.exists(os.path.join(checkpoint_folder, 'fit.npz')):
+            start_episode = self.load_checkpoint(checkpoint_folder)
+        self.start_episode = start_episode
+        steps = np.zeros(n_episodes, dtype=int)
+        if start_episode > 0:
+            steps[:start_episode] = self.steps[:start_episode]
+        self.steps = steps
+        self.stop_reason = None
+        self._precompute_schedules(n_episodes)
+        stopping_criteria = stopping_criteria or []
+        for criterion in stopping_criteria:
+            criterion.reset()
+
+        try:
+            for episode in range(start_episode, n_episodes):
+                episode_start = time.perf_counter()
+                episode_steps, total_reward = self._run_episode(episode, profiler)
+                wall_time = time.perf_counter() - episode_start
+                self.steps[episode] = episode_steps
+                stats = self._episode_stats(episode, episode_steps, total_reward, wall_time)
+                stats.update(self._evaluation_stats(episode + 1, evaluation_interval, evaluation_params))
+
+                for criterion in stopping_criteria:
+                    self.stop_reason = criterion(self, stats)
+                    if self.stop_reason is not None:
+                        self.steps = self.steps[:episode + 1]
+                        break
 
-            print(f'Finished episode {episode} after {self.steps[episode]} steps')
+                if checkpoint_folder is not None and ((episode + 1) % checkpoint_interval == 0 or
+                                                      episode + 1 == n_episodes or self.stop_reason is not None):
+                    self.save_checkpoint(checkpoint_folder, episode + 1)
+
+                yield stats
+                if self.stop_reason is not None:
+                    return
+        finally:
+            self.actor.flush()
+            self.critic.flush()
+
+    def fit(self,
+            n_episodes: int = 300,
+            verbose: bool = True,
+            log_interval: int = 1,
+            metrics_sink: Optional[MetricsSink] = None,
+            checkpoint_folder: Optional[str] = None,
+            checkpoint_interval: int = 100,
+            resume: bool = False,
+            profiler: Optional[PhaseProfiler] = None,
+            stopping_criteria: Optional[list[StoppingCriterion]] = None,
+            evaluation_interval: Optional[int] = None,
+            evaluation_params: Optional[dict] = None) -> None:
+        """Fits the tables/networks of the actors and critic by learning from the environment.
+
+        :param n_episodes: Number of episodes to run the environment.
+        :param verbose: Whether or not to print progress. Nothing is printed if False.
+        :param log_interval: Number of episodes between each printed progress line.
+        :param metrics_sink: If specified, the stats of every episode are written to the sink. When resuming from a
+                             checkpoint, the sink appends to its file,
+                             after removing the rows of the episodes that were run after the checkpoint.
+        :param checkpoint_folder: If specified, a checkpoint is saved here every checkpoint_interval episodes and
+                                  at the end of the fit.
+        :param checkpoint_interval: Number of episodes between each checkpoint.
+        :param resume: Whether to continue from the checkpoint in checkpoint_folder (if there is one).
+        :param profiler: If specified, the time spent in each phase of the fit loop is recorded in the profiler.
+        :param stopping_criteria: Criteria that are checked after every episode to end the fit early. The reason for
+                                  stopping is stored in stop_reason.
+        :param evaluation_interval: If specified, the greedy policy is evaluated every evaluation_interval episodes.
+        :param evaluation_params: Keyword arguments to evaluate(), e.g. n_episodes.
+        :return:
+        """
+
+        started = False
+        try:
+            for stats in self.fit_iter(n_episodes, checkpoint_folder, checkpoint_interval, resume, profiler,
+                                       stopping_criteria, evaluation_interval, evaluation_params):
+                if not started:
+                    started = True
+                    if self.start_episode > 0 and metrics_sink is not None:
+                        metrics_sink.resume(self.start_episode)  # Drops rows written after the checkpoint
+                    if verbose and self.start_episode > 0:
+                        print(f'Resuming fit from episode {self.start_episode}')
+                if metrics_sink is not None:
+                    metrics_sink.write(stats)
+                if verbose and ((stats['episode'] + 1) % log_interval == 0 or stats['episode'] + 1 == n_episodes):
+                    print(f'Finished episode {stats["episode"]} after {stats["steps"]} steps')
+                if verbose and stats.get('eval_n_episodes') is not None:
+                    print(f'Evaluated after episode {stats["episode"]}: mean steps {stats["eval_mean_steps"]:.1f}, '
+                          f'mean reward {stats["eval_mean_reward"]:.1f}, success rate {stats["eval_success_rate"]}')
+            if verbose and self.stop_reason is not None:
+                print(f'Stopped after episode {len(self.steps) - 1}: {self.stop_reason}')
+        finally:
+            if metrics_sink is not None:
+                metrics_sink.close()
 
     def visualize_fit(self) -> None:
         """Visualizes the number of steps taken at each episode during the last fit."""
 
+        from matplotlib import pyplot as plt  # Only loaded when visualizing
+
         plt.plot(self.steps)
         plt.title(f'Timesteps taken in {self.environment.__class__.__name__}')
         plt.xlabel('Episode')
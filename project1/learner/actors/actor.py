@@ -1,10 +1,13 @@
+import os
 from typing import Optional
 
 import numpy as np
-from matplotlib import pyplot as plt
 
 from environments.environment import Environment
 from learner.utils.decaying_variable import DecayingVariable
+from learner.utils.checkpoint import save_arrays, load_arrays
+from learner.utils.eligibility_traces import EligibilityTraces
+from learner.utils.tables import Table, DenseTable, MemmapTable, SparseTable
 
 
 class Actor:
@@ -17,7 +20,16 @@ class Actor:
                  start_epsilon: float = 1.0,
                  end_epsilon: float = 0.1,
                  epsilon_decay: float = 0.05,
-                 trace_decay: float = 0.6):
+                 trace_decay: float = 0.6,
+                 trace_cutoff: float = 1e-4,
+                 table_type: str = 'dense',
+                 table_path: Optional[str] = None,
+                 learning_rate_schedule: str = 'log',
+                 learning_rate_step_size: Optional[int] = None,
+                 epsilon_schedule: str = 'log',
+                 epsilon_step_size: Optional[int] = None,
+                 greedy_cache: bool = True,
+                 table_reuse: bool = False):
         """
         :param environment: Environment object which the actor can interact with.
         :param discount: Discount
@@ -28,36 +40,107 @@ class Actor:
         :param end_epsilon:
         :param epsilon_decay:
         :param trace_decay:
+        :param trace_cutoff: Eligibility traces below this value are dropped from the active trace.
+        :param table_type: Policy table backend. {dense, sparse, memmap}
+                           dense: the whole state space is allocated up front.
+                           sparse: rows are allocated (and legal actions checked) when a state is first visited.
+                           memmap: like dense, but backed by the file table_path. An existing file is overwritten
+                                   unless table_reuse is set. Every checkpoint copies the whole table.
+        :param table_path: path/to/table/file. Only used by the memmap table type.
+        :param learning_rate_schedule: How the learning rate decays. {log, linear, exponential, step}
+        :param learning_rate_step_size: Number of episodes between each decay of the step schedule.
+        :param epsilon_schedule: How epsilon decays. {log, linear, exponential, step}
+        :param epsilon_step_size: Number of episodes between each decay of the step schedule.
+        :param greedy_cache: Whether to cache the greedy action and the legal actions of each state, so that choosing
+                             an action is mostly a lookup instead of a scan of the policy table row. update_pi()
+                             only invalidates the greedy actions of the rows it touches. share_memory() turns the
+                             cache off, so async fits get no speedup from it.
+        :param table_reuse: Whether an existing memmap table file is opened as is instead of being overwritten, e.g.
+                            to serve a trained policy. Resuming a fit does not need it, as the checkpoint holds the
+                            table.
         """
 
         self.environment: Environment = environment
         self.discount: float = discount
         self.learning_rate: DecayingVariable = DecayingVariable(start_learning_rate,
                                                                 end_learning_rate,
-                                                                learning_rate_decay)
+                                                                learning_rate_decay,
+                                                                learning_rate_schedule,
+                                                                learning_rate_step_size)
         self.epsilon: DecayingVariable = DecayingVariable(start_epsilon,
                                                           end_epsilon,
-                                                          epsilon_decay)
+                                                          epsilon_decay,
+                                                          epsilon_schedule,
+                                                          epsilon_step_size)
         self.trace_decay = trace_decay
 
-        self.pi: np.ndarray = self._initialize_pi()
-        self.eligibility: np.ndarray = np.zeros(self.pi.shape)
-        self.episode_mask: np.ndarray = np.zeros(self.pi.shape, dtype=bool)
+        self.pi: Table = self._initialize_pi(table_type, table_path, table_reuse)
+        self.eligibility: EligibilityTraces = EligibilityTraces(trace_cutoff)
 
-    def _initialize_pi(self) -> np.ndarray:
+        # Greedy action of each row of pi.data (-1: not cached, or the row was updated since), and the legal actions
+        # of each row (None: not cached). Rows are cached when first chosen from. None if the cache is disabled.
+        self.greedy_cache: bool = greedy_cache
+        self._greedy: Optional[np.ndarray] = None
+        self._legal_actions: Optional[list[Optional[np.ndarray]]] = None
+        self.invalidate_greedy_cache()
+
+    def _initialize_pi_row(self, state: tuple) -> np.ndarray:
+        """Initializes the policy table row of a single state.
+
+        :param state: State to initialize.
+        :return: Row with zeros for legal actions and np.nan for illegal actions.
+        """
+
+        return np.array([0.0 if self.environment.action_legal_in_state(action, state) else np.nan
+                         for action in range(self.environment.actions)])
+
+    def _initialize_pi_rows(self, state_ids: np.ndarray) -> np.ndarray:
+        """Initializes the policy table rows of an array of states.
+
+        :param state_ids: State ids of the states to initialize.
+        :return: Rows with zeros for legal actions and np.nan for illegal actions, one row per state.
+        """
+
+        legal = self.environment.legal_action_mask(state_ids)
+        if legal is not None:
+            return np.where(legal, 0.0, np.nan)
+        return np.array([self._initialize_pi_row(self.environment.state_tuple(state_id)) for state_id in state_ids])
+
+    def _initialize_pi(self, table_type: str, table_path: Optional[str] = None, table_reuse: bool = False) -> Table:
         """Initializes policy table.
 
         This method checks which actions are illegal in the environment and sets those entries to np.nan.
+        For dense tables the environment's legal_action_mask() is used if implemented, otherwise each SAP is checked
+        separately. Sparse tables check the legal actions of a state when its row is allocated, and memmap tables
+        check them in chunks when the table file is created.
 
+        :param table_type: Policy table backend. {dense, sparse, memmap}
+        :param table_path: path/to/table/file. Only used by the memmap table type.
+        :param table_reuse: Whether an existing memmap table file is opened as is instead of being overwritten.
         :return: Policy table with zeros for legal SAPs and np.nan for illegal SAPs
         """
 
-        pi = np.zeros(self.environment.state_shape + (self.environment.actions,))
-        for state in np.ndindex(pi.shape[:-1]):
-            for action, _ in enumerate(pi[state]):
-                if not self.environment.action_legal_in_state(action, state):
-                    pi[state][action] = np.nan
-        return pi
+        state_shape = self.environment.state_shape
+        row_shape = (self.environment.actions,)
+        state_id = self.environment.state_id
+        if table_type == 'sparse':
+            return SparseTable(state_shape, row_shape, row_initializer=self._initialize_pi_row, state_id=state_id)
+        if table_type == 'memmap':
+            if table_path is None:
+                raise ValueError('table_path must be specified for memmap tables.')
+            return MemmapTable(table_path, state_shape, row_shape, chunk_initializer=self._initialize_pi_rows,
+                               state_id=state_id, reuse=table_reuse)
+        if table_type != 'dense':
+            raise ValueError(f'Unknown table type {table_type}. Must be one of: dense, sparse, memmap.')
+
+        legal = self.environment.legal_action_mask()
+        if legal is not None:
+            return DenseTable(state_shape, row_shape, values=np.where(legal, 0.0, np.nan), state_id=state_id)
+
+        pi = np.zeros(state_shape + row_shape)
+        for state in np.ndindex(state_shape):
+            pi[state] = self._initialize_pi_row(state)
+        return DenseTable(state_shape, row_shape, values=pi, state_id=state_id)
 
     def choose_action(self, state: tuple, episode: Optional[int] = None) -> int:
         """Chooses action using an epsilon greedy scheme.
@@ -74,15 +157,31 @@ class Actor:
         :return: Action chosen by the epsilon greedy algorithm.
         """
 
-        if episode is not None and np.random.random() < self.epsilon(episode):
-            non_nan_actions = np.argwhere(~np.isnan(self.pi[state])).flatten()
-            action = np.random.choice(non_nan_actions)
+        row = self.pi.index(state)
+        if self._greedy is None:
+            if episode is not None and np.random.random() < self.epsilon(episode):
+                non_nan_actions = np.argwhere(~np.isnan(self.pi.data[row])).flatten()
+                action = np.random.choice(non_nan_actions)
+            else:
+                action = np.nanargmax(self.pi.data[row])
         else:
-            action = np.nanargmax(self.pi[state])
+            if row >= len(self._greedy):
+                self._grow_greedy_cache()
+            legal_actions = self._legal_actions[row]
+            if legal_actions is None:
+                legal_actions = self._legal_actions[row] = np.flatnonzero(~np.isnan(self.pi.data[row]))
+            if episode is not None and np.random.random() < self.epsilon(episode):
+                action = np.random.choice(legal_actions)
+            else:
+                action = self._greedy[row]
+                if action < 0:  # Not cached yet, or the row was updated since
+                    if len(legal_actions) == 0:
+                        raise ValueError(f'No legal actions in state {state}.')
+                    # Same as nanargmax: legal_actions is sorted, so ties go to the first action
+                    action = self._greedy[row] = legal_actions[self.pi.data[row, legal_actions].argmax()]
 
         if episode is not None:
-            self.episode_mask[state][action] = True
-            self.eligibility[state][action] = 1
+            self.eligibility.visit(row * self.environment.actions + action)
 
         return action
 
@@ -93,14 +192,111 @@ class Actor:
         :param episode: Episode number. Used to decay learning rate.
         """
 
-        self.pi[self.episode_mask] += self.learning_rate(episode) * delta * self.eligibility[self.episode_mask]
-        self.eligibility[self.episode_mask] *= self.trace_decay * self.discount
+        flat_pi = self.pi.data.reshape(-1)
+        flat_pi[self.eligibility.indices] += self.learning_rate(episode) * delta * self.eligibility.values
+        if self._greedy is not None:
+            self._greedy[self.eligibility.indices // self.environment.actions] = -1  # Recomputed when next chosen from
+        self.eligibility.decay(self.trace_decay * self.discount)
+
+    def invalidate_greedy_cache(self) -> None:
+        """Clears the cached greedy and legal actions, e.g. after pi was modified other than by update_pi()."""
+
+        if not self.greedy_cache:
+            return
+        self._greedy = np.full(len(self.pi.data), -1, dtype=np.intp)
+        self._legal_actions = [None] * len(self.pi.data)
+
+    def _grow_greedy_cache(self) -> None:
+        """Extends the cache to rows allocated in pi.data (by a sparse table) since it was created."""
+
+        n_new = len(self.pi.data) - len(self._greedy)
+        self._greedy = np.concatenate([self._greedy, np.full(n_new, -1, dtype=np.intp)])
+        self._legal_actions.extend([None] * n_new)
 
     def reset(self) -> None:
-        """Reset eligibilities and episode mask (which states have been visited)."""
+        """Reset eligibility traces."""
+
+        self.eligibility.reset()
+
+    def flush(self) -> None:
+        """Writes the policy table to its backing storage, if it has any."""
+
+        self.pi.flush()
+
+    def share_memory(self) -> None:
+        """Moves the policy table to memory that is shared with processes forked afterwards.
+
+        The greedy cache is disabled, as it would not see the updates of the other processes.
+        """
 
-        self.eligibility = np.zeros(self.pi.shape)
-        self.episode_mask = np.zeros(self.pi.shape, dtype=bool)
+        self.pi.share_memory()
+        self.greedy_cache = False
+        self._greedy = None
+        self._legal_actions = None
+
+    def save(self, folder: str) -> list[str]:
+        """Saves the policy table to folder/actor.npz.
+
+        :param folder: Checkpoint folder.
+        :return: Paths of the files written.
+        """
+
+        path = os.path.join(folder, 'actor.npz')
+        save_arrays(path, self.pi.state_dict())
+        return [path]
+
+    def load(self, folder: str) -> None:
+        """Loads the policy table saved by save().
+
+        :param folder: Checkpoint folder.
+        """
+
+        self.pi.load_state_dict(load_arrays(os.path.join(folder, 'actor.npz')))
+        self.invalidate_greedy_cache()
+
+    def greedy_actions(self) -> np.ndarray:
+        """Finds the action with the highest preference in every state.
+
+        Greedy actions are taken from the greedy cache where they are valid, and only the other rows are scanned
+        (filling the cache). share_memory() turns the cache off, so for async fits every row is scanned.
+
+        :return: Integer array of shape state_shape. States without legal actions get -1.
+        """
+
+        if self._greedy is None:
+            pi = self.pi.to_array().reshape(-1, self.environment.actions)
+            return self._argmax_rows(pi).reshape(self.environment.state_shape)
+
+        if len(self._greedy) < len(self.pi.data):
+            self._grow_greedy_cache()
+        n_rows = len(self.pi) if isinstance(self.pi, SparseTable) else self.pi.n_states
+        greedy = self._greedy[:n_rows]  # View, so the cache is filled
+        stale = np.flatnonzero(greedy < 0)
+        greedy[stale] = self._argmax_rows(self.pi.data[stale])
+        if not isinstance(self.pi, SparseTable):
+            return greedy.copy().reshape(self.environment.state_shape)
+
+        actions = np.full(self.pi.n_states, -1, dtype=np.intp)
+        state_ids = np.fromiter(self.pi.rows.keys(), dtype=np.intp, count=n_rows)
+        rows = np.fromiter(self.pi.rows.values(), dtype=np.intp, count=n_rows)
+        actions[state_ids] = greedy[rows]
+        unvisited = np.setdiff1d(np.arange(self.pi.n_states), state_ids)
+        if len(unvisited) > 0:
+            actions[unvisited] = self._argmax_rows(self._initialize_pi_rows(unvisited))
+        return actions.reshape(self.environment.state_shape)
+
+    @staticmethod
+    def _argmax_rows(rows: np.ndarray) -> np.ndarray:
+        """Finds the action with the highest preference in each row.
+
+        :param rows: Policy table rows, one per state.
+        :return: Integer array with one action per row. Rows without legal actions get -1.
+        """
+
+        has_legal = ~np.all(np.isnan(rows), axis=1)
+        actions = np.full(len(rows), -1, dtype=np.intp)
+        actions[has_legal] = np.nanargmax(rows[has_legal], axis=1)
+        return actions
 
     def visualize_strategy(self) -> None:
         """Visualizes strategy if policy table is two-dimensional."""
@@ -108,8 +304,10 @@ class Actor:
         if len(self.pi.shape) != 2:
             raise ValueError('Policy table (PI) must be two dimensional to visualize.')
 
-        mask = np.all(np.isnan(self.pi), axis=1)  # Mask out states with no valid actions (all NaN)
-        plt.plot(np.nanargmax(self.pi[~mask], axis=1))
+        from matplotlib import pyplot as plt  # Only loaded when visualizing
+
+        actions = self.greedy_actions()
+        plt.plot(actions[actions >= 0])  # Mask out states with no valid actions
         plt.title(f'Strategy in {self.environment.__class__.__name__}')
         plt.xlabel('State')
         plt.ylabel('Action')
@@ -0,0 +1,207 @@
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+import traceback
+from typing import Iterator, Optional
+
+import numpy as np
+
+from environments.environment import Environment
+from learner.actor_critic import ActorCritic
+from learner.actors.actor import Actor
+from learner.critics.critic import Critic
+from learner.utils.profiler import PhaseProfiler
+from learner.utils.stopping import StoppingCriterion
+from utils.seeding import set_seed
+
+
+class AsyncActorCritic(ActorCritic):
+    """ActorCritic that fits with several worker processes at once, Hogwild-style.
+
+    The policy table of the actor and the value table/network of the critic are moved to shared memory, and each
+    worker process runs episodes on its own copy of the environment, applying its TD updates to the shared tables
+    without locking. Eligibility traces (and the optimizer of a NetworkCritic) are private to each worker.
+
+    The parent process coordinates the fit: workers claim episode numbers from a shared counter, so the episode used
+    by the DecayingVariable schedules is the global episode count, and report the stats of each episode back to
+    the parent, which keeps steps, checks stopping criteria and saves checkpoints.
+
+    Workers are forked, so this is only supported on platforms with the fork start method. Fits are not
+    reproducible, as the order in which workers update the tables depends on scheduling.
+    """
+
+    def __init__(self,
+                 environment: Environment,
+                 actor: Actor,
+                 critic: Critic,
+                 n_workers: int = 4,
+                 poll_interval: float = 1.0):
+        """
+        :param environment: The Environment object the actor/critic operates on.
+        :param actor: An Actor object.
+        :param critic: A Critic object
+        :param n_workers: Number of worker processes.
+        :param poll_interval: Seconds to wait for stats before checking whether any worker died.
+        """
+
+        super().__init__(environment, actor, critic)
+        self.n_workers: int = n_workers
+        self.poll_interval: float = poll_interval
+
+    def _worker(self, seed: int, n_episodes: int, counter, stop, results) -> None:
+        """Runs episodes until n_episodes have been claimed (or the fit is stopped), reporting the stats of each.
+
+        :param seed: Seed for the random number generators of the worker.
+        :param n_episodes: Number of episodes in the fit.
+        :param counter: Shared value holding the next episode to claim.
+        :param stop: Event that is set when the fit should stop.
+        :param results: Queue the stats are reported to.
+        """
+
+        try:
+            set_seed(seed)
+            if 'torch' in sys.modules:  # Only loaded if the critic uses it
+                sys.modules['torch'].set_num_threads(1)  # Workers are the unit of parallelism
+            while not stop.is_set():
+                with counter.get_lock():
+                    episode = counter.value
+                    if episode >= n_episodes:
+                        break
+                    counter.value += 1
+                episode_start = time.perf_counter()
+                steps, total_reward = self._run_episode(episode)
+                results.put(('episode', (episode, steps, total_reward, time.perf_counter() - episode_start)))
+            results.put(('done', None))
+        except Exception:
+            results.put(('error', traceback.format_exc()))
+
+    @staticmethod
+    def _check_workers(workers: list) -> None:
+        """Raises if any worker process died without reporting an error, e.g. when killed by a signal.
+
+        :param workers: The worker processes.
+        """
+
+        for worker in workers:
+            if worker.exitcode is not None and worker.exitcode != 0:
+                raise RuntimeError(f'Worker {worker.pid} died with exit code {worker.exitcode}.')
+
+    def fit_iter(self,
+                 n_episodes: int = 300,
+                 checkpoint_folder: Optional[str] = None,
+                 checkpoint_interval: int = 100,
+                 resume: bool = False,
+                 profiler: Optional[PhaseProfiler] = None,
+                 stopping_criteria: Optional[list[StoppingCriterion]] = None,
+                 evaluation_interval: Optional[int] = None,
+                 evaluation_params: Optional[dict] = None) -> Iterator[dict]:
+        """Fits the tables/networks of the actor and critic with n_workers processes, yielding the stats of each
+        episode as it finishes.
+
+        Stats arrive in the order episodes finish, which is not necessarily the episode order. If a stopping criterion
+        is met, no more episodes are started, stop_reason is set and steps is truncated to the episodes that were
+        started. Checkpoints are saved up to the first episode that has not finished yet, and the random number
+        generators of the workers are not part of them, so resumed fits continue from the checkpointed tables but
+        not exactly as an uninterrupted fit would.
+
+        :param n_episodes: Number of episodes to run the environment.
+        :param checkpoint_folder: If specified, a checkpoint is saved here every checkpoint_interval episodes and
+                                  at the end of the fit.
+        :param checkpoint_interval: Number of episodes between each checkpoint.
+        :param resume: Whether to continue from the checkpoint in checkpoint_folder (if there is one).
+        :param profiler: Not supported.
+        :param stopping_criteria: Criteria that are checked after every episode to end the fit early.
+        :param evaluation_interval: If specified, the greedy policy is evaluated every evaluation_interval finished
+                                    episodes, while the workers keep fitting.
+        :param evaluation_params: Keyword arguments to evaluate(), e.g. n_episodes.
+        :return: Iterator over the stats of each episode: episode, steps, total_reward, epsilon,
+                 actor_learning_rate, critic_learning_rate and wall_time (seconds), plus the stats of evaluate()
+                 prefixed with eval_ if evaluation_interval is specified.
+        """
+
+        if profiler is not None:
+            raise ValueError('Profiling is not supported for AsyncActorCritic.')
+
+        start_episode = 0
+        if resume and checkpoint_folder is not None and os.path.exists(os.path.join(checkpoint_folder, 'fit.npz')):
+            start_episode = self.load_checkpoint(checkpoint_folder)
+        self.start_episode = start_episode
+        steps = np.zeros(n_episodes, dtype=int)
+        if start_episode > 0:
+            steps[:start_episode] = self.steps[:start_episode]
+        self.steps = steps
+        self.stop_reason = None
+        self._precompute_schedules(n_episodes)
+        stopping_criteria = stopping_criteria or []
+        for criterion in stopping_criteria:
+            criterion.reset()
+
+        self.actor.share_memory()
+        self.critic.share_memory()
+
+        context = mp.get_context('fork')
+        counter = context.Value('i', start_episode)
+        stop = context.Event()
+        results = context.Queue()
+        seeds = np.random.randint(2 ** 31, size=self.n_workers)
+        workers = [context.Process(target=self._worker, args=(int(seed), n_episodes, counter, stop, results))
+                   for seed in seeds]
+        for worker in workers:
+            worker.start()
+
+        finished = np.zeros(n_episodes, dtype=bool)
+        finished[:start_episode] = True
+        n_finished = start_episode
+        n_running = self.n_workers
+        try:
+            last_check = time.perf_counter()
+            while n_running > 0:
+                # A worker killed by a signal (e.g. by the OOM killer) never reports back, so check on them regularly
+                if time.perf_counter() - last_check >= self.poll_interval:
+                    self._check_workers(workers)
+                    last_check = time.perf_counter()
+                try:
+                    kind, message = results.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    continue
+                if kind == 'error':
+                    raise RuntimeError(f'Worker failed:\n{message}')
+                if kind == 'done':
+                    n_running -= 1
+                    continue
+
+                episode, episode_steps, total_reward, wall_time = message
+                self.steps[episode] = episode_steps
+                finished[episode] = True
+                n_finished += 1
+                if stop.is_set():
+                    continue  # Episodes that were running when the fit was stopped are recorded, but not yielded
+                stats = self._episode_stats(episode, episode_steps, total_reward, wall_time)
+                stats.update(self._evaluation_stats(n_finished, evaluation_interval, evaluation_params))
+
+                for criterion in stopping_criteria:
+                    self.stop_reason = criterion(self, stats)
+                    if self.stop_reason is not None:
+                        stop.set()
+                        break
+
+                if checkpoint_folder is not None and n_finished % checkpoint_interval == 0:
+                    first_running = int(np.argmin(finished)) if not finished.all() else n_episodes
+                    self.save_checkpoint(checkpoint_folder, first_running)
+
+                yield stats
+
+            if self.stop_reason is not None:
+                self.steps = self.steps[:counter.value]
+            if checkpoint_folder is not None:
+                self.save_checkpoint(checkpoint_folder, len(self.steps))
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join(timeout=1.0)
+                if worker.is_alive():
+                    worker.terminate()
+            self.actor.flush()
+            self.critic.flush()
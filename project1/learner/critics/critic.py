@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
 from environments.environment import Environment
 from learner.utils.decaying_variable import DecayingVariable
@@ -12,23 +13,29 @@ class Critic(ABC):
                  discount: float = 0.7,
                  start_learning_rate: float = 1.0,
                  end_learning_rate: float = 0.1,
-                 learning_rate_decay: float = 0.05):
+                 learning_rate_decay: float = 0.05,
+                 learning_rate_schedule: str = 'log',
+                 learning_rate_step_size: Optional[int] = None):
         """
         :param environment: Environment object that the critic observes.
         :param discount: Discount parameter used to train V(S).
         :param start_learning_rate: Learning rate at the start of training.
         :param end_learning_rate: Learning rate at the end of training.
         :param learning_rate_decay: Learning rate decay factor.
+        :param learning_rate_schedule: How the learning rate decays. {log, linear, exponential, step}
+        :param learning_rate_step_size: Number of episodes between each decay of the step schedule.
         """
 
         self.environment: Environment = environment
         self.discount: float = discount
         self.learning_rate: DecayingVariable = DecayingVariable(start_learning_rate,
                                                                 end_learning_rate,
-                                                                learning_rate_decay)
+                                                                learning_rate_decay,
+                                                                learning_rate_schedule,
+                                                                learning_rate_step_size)
 
     @abstractmethod
-    def get_delta(self, state: tuple, reward: float, next_state: tuple) -> float:
+    def get_delta(self, state: tuple, reward: float, next_state: tuple, terminal: bool = False) -> float:
         """Computes the temporal difference error (delta/TD_error) based on state, reward, and next_state
 
         The delta is a measure of how good of an estimate we have of V(S).
@@ -38,6 +45,7 @@ class Critic(ABC):
         :param state: Current state
         :param reward: Reward at next state
         :param next_state: Next state
+        :param terminal: Whether next_state is terminal. False if the episode was only cut off by the time limit.
         :return: Temporal difference error
         """
 
@@ -58,3 +66,32 @@ class Critic(ABC):
         """Resets variables that have to be reset before a new episode."""
 
         raise NotImplementedError('Subclasses must implement reset()')
+
+    def flush(self) -> None:
+        """Writes tables/networks to their backing storage, if they have any."""
+
+        pass
+
+    def share_memory(self) -> None:
+        """Moves the table/network to memory that is shared with processes forked afterwards."""
+
+        raise ValueError(f'{self.__class__.__name__} can not be shared between processes.')
+
+    @abstractmethod
+    def save(self, folder: str) -> list[str]:
+        """Saves everything needed to continue training to a checkpoint folder.
+
+        :param folder: Checkpoint folder.
+        :return: Paths of the files written.
+        """
+
+        raise NotImplementedError('Subclasses must implement save()')
+
+    @abstractmethod
+    def load(self, folder: str) -> None:
+        """Loads a checkpoint saved by save().
+
+        :param folder: Checkpoint folder.
+        """
+
+        raise NotImplementedError('Subclasses must implement load()')
@@ -1,43 +1,155 @@
+import os
+from typing import Optional
+
 import numpy as np
 import torch
 
 from learner.critics.critic import Critic
 from learner.utils.network import Network
+from learner.utils.replay_buffer import ReplayBuffer
 
 
 class NetworkCritic(Critic):
     """Critic using a pytorch neural network."""
 
-    def __init__(self, layer_sizes: list[int] = [6, 4, 4], batch_size: int = 20, *args, **kwargs):
+    def __init__(self,
+                 layer_sizes: list[int] = [6, 4, 4],
+                 batch_size: int = 20,
+                 *args,
+                 batched_updates: bool = False,
+                 encoding_table_max_bytes: int = 16 * 2 ** 20,
+                 replay_capacity: Optional[int] = None,
+                 replay_batch_size: int = 32,
+                 replay_ratio: float = 1.0,
+                 replay_start: Optional[int] = None,
+                 num_threads: Optional[int] = None,
+                 **kwargs):
         """
         :param layer_sizes: Hidden layer sizes. Each entry in the list specifies the size of a hidden layer.
         :param batch_size: How many losses should be accumulated before stepping the optimizer.
+        :param batched_updates: If True, transitions are buffered and the loss of the whole batch is computed with
+                                one forward and one backward pass, instead of one backward pass per step.
+        :param encoding_table_max_bytes: Maximum size of the table of precomputed encodings of all states (n_states
+                                         rows of nn_input_size float32 values). Larger state spaces are encoded on the
+                                         fly.
+        :param replay_capacity: If specified, transitions are also stored in a replay buffer of this capacity, and
+                                V is additionally trained on minibatches sampled from it.
+        :param replay_batch_size: Number of transitions in each replayed minibatch.
+        :param replay_ratio: Number of replayed minibatches per environment step. Fractions are carried over, e.g.
+                             0.25 replays one minibatch every fourth step.
+        :param replay_start: Number of transitions stored before replay starts. Defaults to replay_batch_size.
+        :param num_threads: If specified, the number of threads torch uses (for the whole process). Tiny networks
+                            are usually fastest with 1, as the per-op threading overhead outweighs the work.
         """
 
         super().__init__(*args, **kwargs)
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
         self.binary_lenghts = tuple([len(format(s, 'b')) for s in self.environment.state_shape])
         self.nn_input_size = sum(self.binary_lenghts)
+        self._bit_shifts = [np.arange(length - 1, -1, -1) for length in self.binary_lenghts]
+        self.encoding_table: Optional[torch.Tensor] = self._build_encoding_table(encoding_table_max_bytes)
         self.v: Network = Network(self.nn_input_size, layer_sizes)
         self.optimizer = torch.optim.Adam(self.v.parameters(), lr=self.learning_rate())
         self.batch_size = batch_size
         self.batch_count = 0
 
-    def encode_state(self, state: tuple) -> np.ndarray:
-        """Encodes a tupled state to a bit list.
+        self.batched_updates = batched_updates
+        self._batch_states: torch.Tensor = torch.zeros((batch_size, self.nn_input_size))
+        self._batch_targets: torch.Tensor = torch.zeros((batch_size, 1))
+        self._n_buffered = 0
+
+        # Preallocated inputs (state, next_state) of a step, filled in place
+        self._inputs: torch.Tensor = torch.zeros((2, self.nn_input_size))
+        self._input_ids: torch.Tensor = torch.zeros(2, dtype=torch.long)
+        self._delta: Optional[torch.Tensor] = None  # TD error of the last step, with graph, for update_v()
+
+        self.replay_buffer: Optional[ReplayBuffer] = None
+        if replay_capacity is not None:
+            self.replay_buffer = ReplayBuffer(replay_capacity, self.nn_input_size)
+        self.replay_batch_size = replay_batch_size
+        self.replay_ratio = replay_ratio
+        self.replay_start = replay_batch_size if replay_start is None else replay_start
+        self._replay_credit = 0.0
+
+    def _unpack_bits(self, states: np.ndarray) -> np.ndarray:
+        """Encodes an array of states to bit arrays.
+
+        Example: [[2,3,4]] -> [[(0, 1, 0), (0, 1, 1), (1, 0, 0)]] (Parenthesis for visualizing each integer)
+
+        :param states: Integer array of states, one state per row.
+        :return: float32 array of encoded states, one state per row.
+        """
+
+        bits = [(states[:, i, None] >> shifts) & 1 for i, shifts in enumerate(self._bit_shifts)]
+        return np.concatenate(bits, axis=1).astype(np.float32)
+
+    def _build_encoding_table(self, max_bytes: int, chunk_size: int = 2 ** 16) -> Optional[torch.Tensor]:
+        """Precomputes the encodings of all states, indexed by flat state id.
+
+        The table is filled chunk by chunk, so the intermediate arrays of the encoding stay small.
+
+        :param max_bytes: Maximum size of the table in bytes.
+        :param chunk_size: Number of states encoded at a time.
+        :return: Tensor of shape (n_states, nn_input_size), or None if the table would be larger than max_bytes.
+        """
+
+        state_shape = self.environment.state_shape
+        n_states = int(np.prod(state_shape))
+        if n_states * self.nn_input_size * np.dtype(np.float32).itemsize > max_bytes:
+            return None
+        table = torch.empty((n_states, self.nn_input_size))
+        for start in range(0, n_states, chunk_size):
+            state_ids = np.arange(start, min(start + chunk_size, n_states))
+            states = np.stack(np.unravel_index(state_ids, state_shape), axis=1)
+            table[start:start + len(state_ids)] = torch.from_numpy(self._unpack_bits(states))
+        return table
+
+    def encode_states(self, states: np.ndarray) -> torch.Tensor:
+        """Encodes an array of states to bit tensors.
+
+        :param states: Integer array of states, one state per row, or 1-D array of state ids.
+        :return: Tensor of encoded states, one state per row.
+        """
+
+        states = np.asarray(states)
+        state_shape = self.environment.state_shape
+        if self.encoding_table is not None:
+            state_ids = states if states.ndim == 1 else np.ravel_multi_index(states.T, state_shape)
+            return self.encoding_table[state_ids]
+        if states.ndim == 1:
+            states = np.stack(np.unravel_index(states, state_shape), axis=1)
+        return torch.from_numpy(self._unpack_bits(states))
+
+    def encode_state(self, state) -> torch.Tensor:
+        """Encodes a tupled state to a bit tensor.
 
         Example: (2,3,4) -> [(0, 1, 0), (0, 1, 1), (1, 0, 0)] (Parenthesis for visualizing each integer)
 
-        :param state: State in the form of a tuple.
-        :return: State in the form of a bit list.
+        :param state: State in the form of a tuple or a state id.
+        :return: State in the form of a bit tensor.
+        """
+
+        if self.encoding_table is not None:
+            return self.encoding_table[self.environment.state_id(state)]
+        return torch.from_numpy(self._unpack_bits(np.asarray(self.environment.state_tuple(state))[None])[0])
+
+    def _fill_inputs(self, state, next_state) -> None:
+        """Encodes state and next_state into the preallocated inputs, without allocating new tensors.
+
+        :param state: Current state, in the form of a tuple or a state id.
+        :param next_state: Next state, in the form of a tuple or a state id.
         """
 
-        encoded_state = ''
-        for i, s in enumerate(state):
-            binary_state = format(s, f'0{self.binary_lenghts[i]}b')
-            encoded_state += binary_state
-        return np.array(list(encoded_state), dtype=int)
+        if self.encoding_table is not None:
+            self._input_ids[0] = self.environment.state_id(state)
+            self._input_ids[1] = self.environment.state_id(next_state)
+            torch.index_select(self.encoding_table, 0, self._input_ids, out=self._inputs)
+        else:
+            states = np.array([self.environment.state_tuple(state), self.environment.state_tuple(next_state)])
+            self._inputs.numpy()[:] = self._unpack_bits(states)
 
-    def get_delta(self, state: tuple, reward: float, next_state: tuple) -> float:
+    def get_delta(self, state: tuple, reward: float, next_state: tuple, terminal: bool = False) -> float:
         """Computes the temporal difference error (delta/TD_error) based on state, reward, and next_state
 
         The delta is a measure of how good of an estimate we have of V(S).
@@ -47,38 +159,183 @@ class NetworkCritic(Critic):
         :param state: Current state
         :param reward: Reward at next state
         :param next_state: Next state
-        :return: Temporal difference error
+        :param terminal: Whether next_state is terminal. False if the episode was only cut off by the time limit. Only
+                         stored with the transition for replay.
+        :return: Temporal difference error. The graph of the error is kept for update_v().
         """
 
-        with torch.no_grad():
-            next_state = torch.FloatTensor(self.encode_state(next_state))
-            y = reward + self.discount * self.v(next_state)
+        if self.encoding_table is not None and not self.batched_updates:
+            # Rows of the encoding table are used as is (views, no copy)
+            state_input = self.encoding_table[self.environment.state_id(state)]
+            next_state_input = self.encoding_table[self.environment.state_id(next_state)]
+        else:
+            self._fill_inputs(state, next_state)
+            state_input, next_state_input = self._inputs
+        if self.replay_buffer is not None:
+            self.replay_buffer.add(state_input.numpy(), reward, next_state_input.numpy(), terminal)
+
+        if self.batched_updates:
+            return self._get_buffered_delta(reward)
 
-        state = torch.FloatTensor(self.encode_state(state))
+        with torch.inference_mode():
+            y = reward + self.discount * self.v(next_state_input)
 
         # Perform forward pass
-        y_hat = self.v(state)
+        y_hat = self.v(state_input)
+
+        self._delta = y - y_hat
+        return self._delta.item()
+
+    def _get_buffered_delta(self, reward: float) -> float:
+        """Computes the temporal difference error of the filled inputs without building a graph, and buffers the
+        transition.
+
+        V(S) and V(S') are evaluated in one stacked forward pass. The parameters only change when the optimizer
+        steps, so the target computed here is the same as it would be when the batch is trained on, and is buffered
+        instead of next_state.
+
+        :param reward: Reward at next state
+        :return: Temporal difference error
+        """
 
-        delta = y - y_hat
-        return delta
+        with torch.inference_mode():
+            v_state, v_next_state = self.v(self._inputs)
+            y = reward + self.discount * v_next_state
 
-    def update_v(self, delta, episode: int) -> None:
+        if self._n_buffered == len(self._batch_states):  # Only if get_delta() is called without update_v()
+            self._batch_states = torch.cat((self._batch_states, torch.zeros_like(self._batch_states)))
+            self._batch_targets = torch.cat((self._batch_targets, torch.zeros_like(self._batch_targets)))
+        self._batch_states[self._n_buffered] = self._inputs[0]
+        self._batch_targets[self._n_buffered] = y
+        self._n_buffered += 1
+        return (y - v_state).item()
+
+    def _update_v_batch(self, episode: int) -> None:
+        """Trains V on the buffered transitions with one forward and one backward pass, and clears the buffer.
+
+        :param episode: Episode number. Used to decay learning rate.
+        """
+
+        y_hat = self.v(self._batch_states[:self._n_buffered])
+        y = self._batch_targets[:self._n_buffered]
+        loss = (y - y_hat).pow(2).sum()
+
+        self.optimizer.param_groups[0]['lr'] = float(self.learning_rate(episode))
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+        self._n_buffered = 0
+
+    def _replay(self, episode: int) -> None:
+        """Trains V on minibatches sampled from the replay buffer, as many as the replay ratio has earned since the
+        last call.
+
+        Targets are computed with the current network. Transitions where the episode finished are not bootstrapped.
+
+        :param episode: Episode number. Used to decay learning rate.
+        """
+
+        n_minibatches = int(self._replay_credit)
+        if len(self.replay_buffer) < self.replay_start or n_minibatches == 0:
+            return
+        self._replay_credit -= n_minibatches
+
+        self.optimizer.param_groups[0]['lr'] = float(self.learning_rate(episode))
+        for _ in range(n_minibatches):
+            states, rewards, next_states, terminals = self.replay_buffer.sample(self.replay_batch_size)
+            with torch.no_grad():
+                v_next_states = self.v(torch.from_numpy(next_states)).squeeze(1)
+                y = torch.from_numpy(rewards) + self.discount * v_next_states * torch.from_numpy(~terminals)
+            y_hat = self.v(torch.from_numpy(states)).squeeze(1)
+            loss = (y - y_hat).pow(2).sum()
+
+            self.optimizer.zero_grad()
+            loss.backward()
+            self.optimizer.step()
+        self.optimizer.zero_grad()
+
+    def update_v(self, delta: float, episode: int) -> None:
         """Updates value function V using the temporal difference error delta.
 
+        The loss is computed from the graph of the error kept by get_delta(), as delta itself is a plain float.
+
        :param delta: Temporal difference error
        :param episode: Episode nubmer. Used to decay learning rate.
        """
 
-        loss = delta.pow(2)
+        if self.replay_buffer is not None:
+            self._replay_credit += self.replay_ratio
+
+        if self.batched_updates:
+            if self._n_buffered >= self.batch_size:
+                self._update_v_batch(episode)
+                if self.replay_buffer is not None:
+                    self._replay(episode)
+            return
+
+        loss = self._delta.pow(2)
         loss.backward()
         self.batch_count += 1
         if self.batch_count >= self.batch_size:
-            self.optimizer.param_groups[0]['lr'] = self.learning_rate(episode)
+            self.optimizer.param_groups[0]['lr'] = float(self.learning_rate(episode))
             self.optimizer.step()
             self.optimizer.zero_grad()
             self.batch_count = 0
+            if self.replay_buffer is not None:
+                self._replay(episode)  # Gradients are only free for replay while no online loss is accumulated
 
     def reset(self) -> None:
         """Nothing has to be reset for the NetworkCritic in between episodes."""
         pass
 
+    def share_memory(self) -> None:
+        """Moves the network parameters to shared memory.
+
+        The optimizer state is not shared, so processes forked afterwards each step their own optimizer on the shared
+        parameters.
+        """
+
+        self.v.share_memory()
+
+    def save(self, folder: str) -> list[str]:
+        """Saves the network weights, the optimizer state, the partially accumulated batch and the replay buffer to
+        folder/critic.pt.
+
+        :param folder: Checkpoint folder.
+        :return: Paths of the files written.
+        """
+
+        checkpoint = {
+            'v': self.v.state_dict(),
+            'optimizer': self.optimizer.state_dict(),
+            'grads': [p.grad for p in self.v.parameters()],
+            'batch_count': self.batch_count,
+            'batch_states': self._batch_states[:self._n_buffered].clone(),
+            'batch_targets': self._batch_targets[:self._n_buffered].clone(),
+        }
+        if self.replay_buffer is not None:
+            checkpoint['replay_buffer'] = {k: torch.from_numpy(v) for k, v in self.replay_buffer.state_dict().items()}
+            checkpoint['replay_credit'] = self._replay_credit
+        path = os.path.join(folder, 'critic.pt')
+        torch.save(checkpoint, f'{path}.tmp')
+        os.replace(f'{path}.tmp', path)
+        return [path]
+
+    def load(self, folder: str) -> None:
+        """Loads a checkpoint saved by save().
+
+        :param folder: Checkpoint folder.
+        """
+
+        checkpoint = torch.load(os.path.join(folder, 'critic.pt'))
+        self.v.load_state_dict(checkpoint['v'])
+        self.optimizer.load_state_dict(checkpoint['optimizer'])
+        for p, grad in zip(self.v.parameters(), checkpoint['grads']):
+            p.grad = grad
+        self.batch_count = checkpoint['batch_count']
+        self._n_buffered = len(checkpoint['batch_states'])
+        self._batch_states[:self._n_buffered] = checkpoint['batch_states']
+        self._batch_targets[:self._n_buffered] = checkpoint['batch_targets']
+        if self.replay_buffer is not None:
+            self.replay_buffer.load_state_dict({k: v.numpy() for k, v in checkpoint['replay_buffer'].items()})
+            self._replay_credit = checkpoint['replay_credit']
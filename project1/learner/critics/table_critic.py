@@ -1,21 +1,60 @@
-import numpy as np
+import os
+from typing import Optional
 
 from learner.critics.critic import Critic
+from learner.utils.checkpoint import save_arrays, load_arrays
+from learner.utils.eligibility_traces import EligibilityTraces
+from learner.utils.tables import Table, DenseTable, MemmapTable, SparseTable
 
 
 class TableCritic(Critic):
-    def __init__(self, trace_decay: float = 0.6, *args, **kwargs):
+    def __init__(self,
+                 trace_decay: float = 0.6,
+                 *args,
+                 trace_cutoff: float = 1e-4,
+                 table_type: str = 'dense',
+                 table_path: Optional[str] = None,
+                 table_reuse: bool = False,
+                 **kwargs):
         """
         :param trace_decay: Decay rate for eligibility traces.
+        :param trace_cutoff: Eligibility traces below this value are dropped from the active trace.
+        :param table_type: Value table backend. {dense, sparse, memmap}
+                           dense: the whole state space is allocated up front.
+                           sparse: rows are allocated when a state is first visited.
+                           memmap: like dense, but backed by the file table_path. An existing file is overwritten
+                                   unless table_reuse is set. Every checkpoint copies the whole table.
+        :param table_path: path/to/table/file. Only used by the memmap table type.
+        :param table_reuse: Whether an existing memmap table file is opened as is instead of being overwritten.
+                            Resuming a fit does not need it, as the checkpoint holds the table.
         """
 
         super().__init__(*args, **kwargs)
         self.trace_decay = trace_decay
-        self.v: np.ndarray = np.zeros(self.environment.state_shape)
-        self.eligibility: np.ndarray = np.zeros(self.v.shape)
-        self.episode_mask: np.ndarray = np.zeros(self.v.shape, dtype=bool)
+        self.v: Table = self._initialize_v(table_type, table_path, table_reuse)
+        self.eligibility: EligibilityTraces = EligibilityTraces(trace_cutoff)
 
-    def get_delta(self, state: tuple, reward: float, next_state: tuple) -> float:
+    def _initialize_v(self, table_type: str, table_path: Optional[str] = None, table_reuse: bool = False) -> Table:
+        """Initializes value table with zeros.
+
+        :param table_type: Value table backend. {dense, sparse, memmap}
+        :param table_path: path/to/table/file. Only used by the memmap table type.
+        :param table_reuse: Whether an existing memmap table file is opened as is instead of being overwritten.
+        :return: Value table.
+        """
+
+        if table_type == 'sparse':
+            return SparseTable(self.environment.state_shape, state_id=self.environment.state_id)
+        if table_type == 'memmap':
+            if table_path is None:
+                raise ValueError('table_path must be specified for memmap tables.')
+            return MemmapTable(table_path, self.environment.state_shape, state_id=self.environment.state_id,
+                               reuse=table_reuse)
+        if table_type != 'dense':
+            raise ValueError(f'Unknown table type {table_type}. Must be one of: dense, sparse, memmap.')
+        return DenseTable(self.environment.state_shape, state_id=self.environment.state_id)
+
+    def get_delta(self, state: tuple, reward: float, next_state: tuple, terminal: bool = False) -> float:
         """Computes the temporal difference error (delta/TD_error) based on state, reward, and next_state
 
         The delta is a measure of how good of an estimate we have of V(S).
@@ -25,12 +64,13 @@ class TableCritic(Critic):
         :param state: Current state
         :param reward: Reward at next state
         :param next_state: Next state
+        :param terminal: Whether next_state is terminal. False if the episode was only cut off by the time limit.
         :return: Temporal difference error
         """
 
-        delta: float = reward + self.discount * self.v[next_state] - self.v[state]
-        self.episode_mask[state] = True
-        self.eligibility[state] = 1
+        row = self.v.index(state)
+        delta: float = reward + self.discount * self.v[next_state] - self.v.data[row]
+        self.eligibility.visit(row)
         return delta
 
     def update_v(self, delta: float, episode: int) -> None:
@@ -40,14 +80,42 @@ class TableCritic(Critic):
         :param episode: Episode number. Used to decay learning rate.
         """
 
-        self.v[self.episode_mask] += self.learning_rate(episode) * delta * self.eligibility[self.episode_mask]
-        self.eligibility[self.episode_mask] *= self.discount * self.trace_decay
+        self.v.data[self.eligibility.indices] += self.learning_rate(episode) * delta * self.eligibility.values
+        self.eligibility.decay(self.discount * self.trace_decay)
 
     def reset(self) -> None:
         """Resets eligibility."""
 
-        self.eligibility = np.zeros(self.v.shape)
-        self.episode_mask = np.zeros(self.v.shape, dtype=bool)
+        self.eligibility.reset()
+
+    def flush(self) -> None:
+        """Writes the value table to its backing storage, if it has any."""
+
+        self.v.flush()
+
+    def share_memory(self) -> None:
+        """Moves the value table to memory that is shared with processes forked afterwards."""
+
+        self.v.share_memory()
+
+    def save(self, folder: str) -> list[str]:
+        """Saves the value table to folder/critic.npz.
+
+        :param folder: Checkpoint folder.
+        :return: Paths of the files written.
+        """
+
+        path = os.path.join(folder, 'critic.npz')
+        save_arrays(path, self.v.state_dict())
+        return [path]
+
+    def load(self, folder: str) -> None:
+        """Loads the value table saved by save().
+
+        :param folder: Checkpoint folder.
+        """
+
+        self.v.load_state_dict(load_arrays(os.path.join(folder, 'critic.npz')))
 
 
 if __name__ == '__main__':
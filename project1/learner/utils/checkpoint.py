@@ -0,0 +1,45 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+def save_arrays(path: str, arrays: dict[str, np.ndarray]) -> None:
+    """Saves arrays to an .npz file.
+
+    The file is written next to path first and then moved in place, so an interrupted save never leaves a
+    corrupt checkpoint behind.
+
+    :param path: path/to/file.npz
+    :param arrays: Arrays to save, by name.
+    """
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_arrays(path: str) -> dict[str, np.ndarray]:
+    """Loads all arrays from an .npz file.
+
+    :param path: path/to/file.npz
+    :return: Arrays, by name.
+    """
+
+    with np.load(path) as f:
+        return dict(f)
+
+
+def file_digest(path: str) -> str:
+    """Computes a digest of the contents of a file, e.g. to check that checkpoint files belong together.
+
+    :param path: path/to/file
+    :return: Hex digest of the file.
+    """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,16 +1,52 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
 import numpy as np
 
+from learner.utils.schedules import SCHEDULES
+
 
 @dataclass
 class DecayingVariable:
-    """Utility class for decaying a variable based on episode."""
+    """Utility class for decaying a variable based on episode.
+
+    The values are computed for a range of episodes at once and looked up afterwards, so calling the variable costs
+    a list lookup. The range is doubled whenever an episode beyond it is requested.
+    """
 
     start_value: float
     end_value: Optional[float] = None
     decay: Optional[float] = None
+    schedule: str = 'log'  # {log, linear, exponential, step}, see learner/utils/schedules.py
+    step_size: Optional[int] = None  # Only used by the step schedule
+    _values: list[float] = field(default_factory=list, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.schedule not in SCHEDULES:
+            raise ValueError(f'Unknown schedule {self.schedule}. Must be one of: {", ".join(SCHEDULES)}.')
+        if self.schedule == 'step' and self.step_size is None:
+            raise ValueError('step_size must be specified for step schedules.')
+
+    def values(self, n_episodes: int) -> np.ndarray:
+        """Computes the values of the variable for the first n_episodes episodes, e.g. to plot the schedule.
+
+        :param n_episodes: Number of episodes.
+        :return: Array with the value of the variable at each episode.
+        """
+
+        if self.end_value is None or self.decay is None:
+            return np.full(n_episodes, self.start_value, dtype=float)
+        episodes = np.arange(n_episodes)
+        decayed = SCHEDULES[self.schedule](self.start_value, self.end_value, self.decay, episodes, self.step_size)
+        return np.maximum(decayed, self.end_value)
+
+    def precompute(self, n_episodes: int) -> None:
+        """Computes the values of the variable for the first n_episodes episodes, so they can be looked up.
+
+        :param n_episodes: Number of episodes.
+        """
+
+        self._values = self.values(n_episodes).tolist()
 
     def __call__(self, episode: Optional[int] = None):
         """Returns the decayed value of the variable based on the episode.
@@ -19,7 +55,8 @@ class DecayingVariable:
         :return: The decayed value.
         """
 
-        if episode is None or self.end_value is None or self.decay is None:
+        if episode is None:
             return self.start_value
-        decayed = min(self.start_value, self.start_value - np.log10((episode + 1) * self.decay))
-        return max(decayed, self.end_value)
+        if episode >= len(self._values):
+            self.precompute(max(2 * len(self._values), episode + 1, 1024))
+        return self._values[episode]
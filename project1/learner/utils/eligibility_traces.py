@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class EligibilityTraces:
+    """Sparse store of eligibility traces.
+
+    Only the active entries (those with a trace above the cutoff) are kept, as flat indices into the table the
+    traces belong to. Updates therefore scale with the length of the trace, not the size of the table.
+    """
+
+    def __init__(self, cutoff: float = 1e-4, capacity: int = 64):
+        """
+        :param cutoff: Traces that decay below this value are dropped.
+        :param capacity: Initial capacity of the compact index/value arrays. Grows when needed.
+        """
+
+        self.cutoff: float = cutoff
+        self._indices: np.ndarray = np.empty(capacity, dtype=np.intp)
+        self._values: np.ndarray = np.empty(capacity)
+        self._positions: dict[int, int] = {}  # Flat index -> position in the compact arrays
+        self._length: int = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def indices(self) -> np.ndarray:
+        """Flat table indices of the active traces."""
+
+        return self._indices[:self._length]
+
+    @property
+    def values(self) -> np.ndarray:
+        """Trace values of the active traces (aligned with indices)."""
+
+        return self._values[:self._length]
+
+    def visit(self, index: int) -> None:
+        """Sets the trace of a flat index to 1, activating it if needed.
+
+        :param index: Flat index into the table.
+        """
+
+        position = self._positions.get(index)
+        if position is None:
+            if self._length == len(self._indices):
+                self._indices = np.resize(self._indices, 2 * self._length)
+                self._values = np.resize(self._values, 2 * self._length)
+            position = self._length
+            self._positions[index] = position
+            self._indices[position] = index
+            self._length += 1
+        self._values[position] = 1
+
+    def decay(self, factor: float) -> None:
+        """Decays all active traces and drops the ones that fall below the cutoff.
+
+        :param factor: Multiplicative decay factor.
+        """
+
+        values = self.values
+        values *= factor
+        keep = values >= self.cutoff
+        if keep.all():
+            return
+
+        n_kept = int(np.count_nonzero(keep))
+        self._indices[:n_kept] = self.indices[keep]
+        self._values[:n_kept] = values[keep]
+        self._length = n_kept
+        self._positions = {index: position for position, index in enumerate(self._indices[:n_kept].tolist())}
+
+    def reset(self) -> None:
+        """Drops all traces. The compact arrays are kept for reuse."""
+
+        self._positions.clear()
+        self._length = 0
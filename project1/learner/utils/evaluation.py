@@ -0,0 +1,33 @@
+from typing import Optional
+
+import numpy as np
+
+# Percentiles of the episode lengths reported by summarize_episodes()
+STEP_PERCENTILES = (5, 50, 95)
+
+# Stats returned by summarize_episodes(), in order
+EVALUATION_STATS = ('n_episodes', 'mean_steps', 'std_steps', 'min_steps',
+                    *(f'p{p}_steps' for p in STEP_PERCENTILES),
+                    'max_steps', 'mean_reward', 'std_reward', 'success_rate')
+
+
+def summarize_episodes(steps: np.ndarray, rewards: np.ndarray, successes: list[Optional[bool]]) -> dict:
+    """Aggregates the episodes of an evaluation.
+
+    :param steps: Number of steps of each episode.
+    :param rewards: Total reward of each episode.
+    :param successes: Whether each episode was a success (see Environment.is_success()).
+    :return: The stats in EVALUATION_STATS. success_rate is None if the environment does not define success.
+    """
+
+    percentiles = np.percentile(steps, STEP_PERCENTILES)
+    success_rate = None if any(s is None for s in successes) else float(np.mean(successes))
+    return {'n_episodes': len(steps),
+            'mean_steps': float(np.mean(steps)),
+            'std_steps': float(np.std(steps)),
+            'min_steps': int(np.min(steps)),
+            **{f'p{p}_steps': float(value) for p, value in zip(STEP_PERCENTILES, percentiles)},
+            'max_steps': int(np.max(steps)),
+            'mean_reward': float(np.mean(rewards)),
+            'std_reward': float(np.std(rewards)),
+            'success_rate': success_rate}
@@ -0,0 +1,145 @@
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+
+
+class MetricsSink(ABC):
+    """Abstract class for sinks that the per-episode stats of a fit are written to.
+
+    Rows are buffered in memory and written buffer_size rows at a time, so that the fit loop does not wait on
+    file I/O after every episode.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 100, append: bool = False):
+        """
+        :param path: path/to/metrics/file
+        :param buffer_size: Number of rows buffered before they are written to the file.
+        :param append: Whether to append to an existing file (e.g. when resuming a fit) instead of overwriting it.
+                       Can be changed until the first rows are written.
+        """
+
+        self.path: str = path
+        self.buffer_size: int = buffer_size
+        self.append: bool = append
+        self.buffer: list[dict] = []
+        self._file = None
+
+    def resume(self, start_episode: int) -> None:
+        """Prepares the sink for a fit resumed from a checkpoint at start_episode.
+
+        The rows of episodes from start_episode on were written after the checkpoint was saved and will be written
+        again, so they are removed from the file. Further rows are appended to it.
+
+        :param start_episode: First episode of the resumed fit.
+        """
+
+        self.append = True
+        if not os.path.exists(self.path):
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(self.path, 'r', newline='') as source, open(tmp_path, 'w', newline='') as target:
+            self._copy_rows_before(source, target, start_episode)
+        os.replace(tmp_path, self.path)
+
+    def write(self, row: dict) -> None:
+        """Adds a row of stats, writing the buffered rows to the file if the buffer is full.
+
+        :param row: Stats by name.
+        """
+
+        self.buffer.append(row)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the buffered rows to the file."""
+
+        if not self.buffer:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'a' if self.append else 'w', newline='')
+        self._write_rows(self.buffer)
+        self._file.flush()
+        self.buffer = []
+
+    def close(self) -> None:
+        """Writes the buffered rows and closes the file."""
+
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @abstractmethod
+    def _write_rows(self, rows: list[dict]) -> None:
+        """Writes rows to the open file.
+
+        :param rows: Rows of stats by name.
+        """
+
+        raise NotImplementedError('Subclasses must implement _write_rows()')
+
+    @abstractmethod
+    def _copy_rows_before(self, source, target, episode: int) -> None:
+        """Copies the rows of the episodes before episode from one file to another.
+
+        :param source: File to read the rows from.
+        :param target: File to write the rows to.
+        :param episode: First episode that is not copied.
+        """
+
+        raise NotImplementedError('Subclasses must implement _copy_rows_before()')
+
+
+class JsonlSink(MetricsSink):
+    """Writes one JSON object per row."""
+
+    def _write_rows(self, rows: list[dict]) -> None:
+        self._file.write(''.join(json.dumps(row) + '\n' for row in rows))
+
+    def _copy_rows_before(self, source, target, episode: int) -> None:
+        target.writelines(line for line in source if line.strip() and json.loads(line)['episode'] < episode)
+
+
+class CsvSink(MetricsSink):
+    """Writes one CSV line per row, with the keys of the first row as header. When appending to a file that already
+    has rows, the header is not written again.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._writer = None
+
+    def _write_rows(self, rows: list[dict]) -> None:
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(rows[0]))
+            if self._file.tell() == 0:  # Files opened for appending are positioned at their end
+                self._writer.writeheader()
+        self._writer.writerows(rows)
+
+    def _copy_rows_before(self, source, target, episode: int) -> None:
+        reader = csv.DictReader(source)
+        if reader.fieldnames is None:  # Empty file
+            return
+        writer = csv.DictWriter(target, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        writer.writerows(row for row in reader if int(row['episode']) < episode)
+
+    def close(self) -> None:
+        super().close()
+        self._writer = None
+
+
+def get_metrics_sink(path: str, buffer_size: int = 100, append: bool = False) -> MetricsSink:
+    """Creates a CSV or JSONL sink depending on the file extension.
+
+    :param path: path/to/file.csv or path/to/file.jsonl
+    :param buffer_size: Number of rows buffered before they are written to the file.
+    :param append: Whether to append to an existing file instead of overwriting it.
+    :return: The sink.
+    """
+
+    if path.endswith('.csv'):
+        return CsvSink(path, buffer_size, append)
+    return JsonlSink(path, buffer_size, append)
@@ -1,5 +1,8 @@
 import numpy as np
 from torch import nn
+from torch.nn import functional as F
+
+from utils.seeding import seed_torch
 
 
 class Network(nn.Module):
@@ -12,7 +15,8 @@ class Network(nn.Module):
         """
 
         super().__init__()
-        layer_sizes.append(1)
+        seed_torch()  # torch may have been imported after set_seed()
+        layer_sizes = layer_sizes + [1]  # Copy, so the caller's (or default) list is not modified
         layer_stack = []
         layer_stack.append(nn.Linear(input_size, layer_sizes[0]))
         for in_size, out_size in zip(layer_sizes, layer_sizes[1:]):
@@ -27,12 +31,20 @@ class Network(nn.Module):
             if classname.find('Linear') != -1:
                 nn.init.xavier_uniform_(m.weight)
         self.layer_stack.apply(weights_init)
+        # (weight, bias) of each linear layer. Parameters are updated in place, so these stay valid.
+        self._linear_parameters = [(m.weight, m.bias) for m in self.layer_stack if isinstance(m, nn.Linear)]
 
     def forward(self, x: np.ndarray) -> float:
         """Forwards x through the network.
 
+        The layers are applied functionally rather than by calling layer_stack, as the per-module call overhead
+        dominates the cost of a forward pass through a tiny network. The result is the same.
+
         :param x: Input to network.
         :return: Output after forward pass.
         """
 
-        return self.layer_stack(x)
+        *hidden, (weight, bias) = self._linear_parameters
+        for hidden_weight, hidden_bias in hidden:
+            x = F.relu(F.linear(x, hidden_weight, hidden_bias))
+        return F.linear(x, weight, bias)
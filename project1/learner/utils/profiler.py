@@ -0,0 +1,154 @@
+import csv
+import json
+import time
+from typing import TYPE_CHECKING, Callable
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from prettytable import PrettyTable
+
+
+class PhaseProfiler:
+    """Accumulates the time spent in each phase of the fit loop, per episode.
+
+    The fit loop calls the phases through the wrappers returned by timed(), between start_episode() and
+    end_episode(), which records the totals of the episode with record_episode(). The overhead while profiling is
+    one function call and two clock reads per phase, and there is none without a profiler.
+    """
+
+    # Indices of the phases in PHASES
+    CHOOSE_ACTION, ENVIRONMENT_NEXT, GET_DELTA, UPDATE_V, UPDATE_PI = range(5)
+    PHASES = ('choose_action', 'environment_next', 'get_delta', 'update_v', 'update_pi')
+
+    def __init__(self):
+        self.episodes: list[int] = []
+        self.steps: list[int] = []
+        self.wall_times: list[float] = []
+        self.phase_times: list[list[float]] = []  # One list of seconds per phase for each episode
+
+        # Timings of the current episode
+        self._episode_start: float = 0.0
+        self._episode_phase_times: list[float] = [0.0] * len(self.PHASES)
+
+    def timed(self, phase: int, function: Callable) -> Callable:
+        """Wraps a function so that the time spent in it is added to a phase of the current episode.
+
+        :param phase: Index of the phase in PHASES, e.g. PhaseProfiler.CHOOSE_ACTION.
+        :param function: Function that runs the phase.
+        :return: The wrapped function.
+        """
+
+        perf_counter = time.perf_counter
+
+        def timed_function(*args):
+            start = perf_counter()
+            result = function(*args)
+            self._episode_phase_times[phase] += perf_counter() - start
+            return result
+
+        return timed_function
+
+    def start_episode(self) -> None:
+        """Starts timing an episode."""
+
+        self._episode_phase_times = [0.0] * len(self.PHASES)
+        self._episode_start = time.perf_counter()
+
+    def end_episode(self, episode: int, steps: int) -> None:
+        """Stops timing an episode and records its timings.
+
+        :param episode: Episode number.
+        :param steps: Number of steps taken in the episode.
+        """
+
+        self.record_episode(episode, steps, time.perf_counter() - self._episode_start, self._episode_phase_times)
+
+    def record_episode(self, episode: int, steps: int, wall_time: float, phase_times: list[float]) -> None:
+        """Records the timings of one episode.
+
+        :param episode: Episode number.
+        :param steps: Number of steps taken in the episode.
+        :param wall_time: Seconds spent on the whole episode.
+        :param phase_times: Seconds spent in each phase, in the order of PHASES.
+        """
+
+        self.episodes.append(episode)
+        self.steps.append(steps)
+        self.wall_times.append(wall_time)
+        self.phase_times.append(list(phase_times))
+
+    def rows(self) -> list[dict]:
+        """Returns the recorded timings with one row per episode.
+
+        :return: Rows with episode, steps, wall_time, steps_per_second and the seconds spent in each phase.
+        """
+
+        rows = []
+        for episode, steps, wall_time, phase_times in zip(self.episodes, self.steps, self.wall_times, self.phase_times):
+            row = {'episode': episode,
+                   'steps': steps,
+                   'wall_time': wall_time,
+                   'steps_per_second': steps / wall_time if wall_time > 0 else 0.0}
+            row.update(zip(self.PHASES, phase_times))
+            rows.append(row)
+        return rows
+
+    def to_json(self, path: str) -> None:
+        """Exports the timings of each episode to a JSON file.
+
+        :param path: path/to/file.json
+        """
+
+        with open(path, 'w') as f:
+            json.dump(self.rows(), f, indent=2)
+
+    def to_csv(self, path: str) -> None:
+        """Exports the timings of each episode to a CSV file.
+
+        :param path: path/to/file.csv
+        """
+
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['episode', 'steps', 'wall_time', 'steps_per_second', *self.PHASES])
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def export(self, path: str) -> None:
+        """Exports the timings to JSON or CSV depending on the file extension.
+
+        :param path: path/to/file.json or path/to/file.csv
+        """
+
+        if path.endswith('.csv'):
+            self.to_csv(path)
+        else:
+            self.to_json(path)
+
+    def summary(self) -> 'PrettyTable':
+        """Summarizes the time spent in each phase over all recorded episodes.
+
+        :return: Table with total seconds, share of wall time and microseconds per step for each phase.
+        """
+
+        from prettytable import PrettyTable  # Only loaded when printing a summary
+
+        total_steps = max(sum(self.steps), 1)
+        total_time = sum(self.wall_times)
+        phase_totals = np.sum(self.phase_times, axis=0) if self.phase_times else np.zeros(len(self.PHASES))
+
+        table = PrettyTable(['Phase', 'Total [s]', 'Share [%]', 'Per step [us]'])
+        for phase, phase_total in zip(self.PHASES + ('other',), [*phase_totals, total_time - phase_totals.sum()]):
+            share = 100 * phase_total / total_time if total_time > 0 else 0.0
+            table.add_row([phase, f'{phase_total:.3f}', f'{share:.1f}', f'{1e6 * phase_total / total_steps:.2f}'])
+        table.add_row(['total', f'{total_time:.3f}', '100.0', f'{1e6 * total_time / total_steps:.2f}'])
+        return table
+
+    def print_summary(self) -> None:
+        """Prints the summary table and the overall step throughput."""
+
+        total_time = sum(self.wall_times)
+        print(self.summary())
+        if total_time > 0:
+            total_steps = sum(self.steps)
+            print(f'{total_steps} steps in {len(self.episodes)} episodes ({total_steps / total_time:.0f} steps/s)')
@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    """Fixed-capacity ring buffer of transitions, with storage preallocated as numpy arrays.
+
+    Once the buffer is full, new transitions overwrite the oldest ones, so memory stays the same however long a fit
+    runs.
+    """
+
+    def __init__(self, capacity: int, state_size: int):
+        """
+        :param capacity: Maximum number of transitions stored.
+        :param state_size: Size of an (encoded) state.
+        """
+
+        self.capacity: int = capacity
+        self.states: np.ndarray = np.zeros((capacity, state_size), dtype=np.float32)
+        self.rewards: np.ndarray = np.zeros(capacity, dtype=np.float32)
+        self.next_states: np.ndarray = np.zeros((capacity, state_size), dtype=np.float32)
+        self.terminals: np.ndarray = np.zeros(capacity, dtype=bool)
+        self.position: int = 0  # Where the next transition is written
+        self.size: int = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, state: np.ndarray, reward: float, next_state: np.ndarray, terminal: bool) -> None:
+        """Stores a transition, overwriting the oldest one if the buffer is full.
+
+        :param state: Encoded state.
+        :param reward: Reward for moving to next_state.
+        :param next_state: Encoded next state.
+        :param terminal: Whether the episode ended in next_state.
+        """
+
+        self.states[self.position] = state
+        self.rewards[self.position] = reward
+        self.next_states[self.position] = next_state
+        self.terminals[self.position] = terminal
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Samples transitions uniformly (with replacement).
+
+        :param batch_size: Number of transitions to sample.
+        :return: (states, rewards, next_states, terminals), one transition per row.
+        """
+
+        indices = np.random.randint(0, self.size, size=batch_size)
+        return self.states[indices], self.rewards[indices], self.next_states[indices], self.terminals[indices]
+
+    def state_dict(self) -> dict[str, np.ndarray]:
+        """Returns the contents of the buffer as arrays, e.g. for checkpointing.
+
+        :return: Arrays, by name.
+        """
+
+        return {'states': self.states[:self.size],
+                'rewards': self.rewards[:self.size],
+                'next_states': self.next_states[:self.size],
+                'terminals': self.terminals[:self.size],
+                'position': np.array(self.position)}
+
+    def load_state_dict(self, state_dict: dict[str, np.ndarray]) -> None:
+        """Restores the contents of the buffer from arrays returned by state_dict().
+
+        :param state_dict: Arrays, by name.
+        """
+
+        self.size = len(state_dict['rewards'])
+        self.states[:self.size] = state_dict['states']
+        self.rewards[:self.size] = state_dict['rewards']
+        self.next_states[:self.size] = state_dict['next_states']
+        self.terminals[:self.size] = state_dict['terminals']
+        self.position = int(state_dict['position'])
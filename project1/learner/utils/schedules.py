@@ -0,0 +1,54 @@
+from typing import Callable, Optional
+
+import numpy as np
+
+
+def log_schedule(start: float,
+                 end: float,
+                 decay: float,
+                 episodes: np.ndarray,
+                 step_size: Optional[int]) -> np.ndarray:
+    """Decays by log10 of the episode: start - log10((episode + 1) * decay)."""
+
+    return np.minimum(start, start - np.log10((episodes + 1) * decay))
+
+
+def linear_schedule(start: float,
+                    end: float,
+                    decay: float,
+                    episodes: np.ndarray,
+                    step_size: Optional[int]) -> np.ndarray:
+    """Decays by decay every episode: start - decay * episode."""
+
+    return start - decay * episodes
+
+
+def exponential_schedule(start: float,
+                         end: float,
+                         decay: float,
+                         episodes: np.ndarray,
+                         step_size: Optional[int]) -> np.ndarray:
+    """Decays by a factor (1 - decay) every episode: start * (1 - decay) ** episode."""
+
+    return start * (1 - decay) ** episodes
+
+
+def step_schedule(start: float,
+                  end: float,
+                  decay: float,
+                  episodes: np.ndarray,
+                  step_size: Optional[int]) -> np.ndarray:
+    """Decays by a factor (1 - decay) every step_size episodes: start * (1 - decay) ** (episode // step_size)."""
+
+    if step_size is None:
+        raise ValueError('step_size must be specified for step schedules.')
+    return start * (1 - decay) ** (episodes // step_size)
+
+
+# Schedules by name. Each computes the (not yet clipped at end) values of the variable at an array of episodes.
+SCHEDULES: dict[str, Callable[[float, float, float, np.ndarray, Optional[int]], np.ndarray]] = {
+    'log': log_schedule,
+    'linear': linear_schedule,
+    'exponential': exponential_schedule,
+    'step': step_schedule,
+}
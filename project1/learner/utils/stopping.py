@@ -0,0 +1,170 @@
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import TYPE_CHECKING, Optional, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from learner.actor_critic import ActorCritic
+
+
+class StoppingCriterion(ABC):
+    """Abstract class for criteria that end a fit before its episode budget is used up.
+
+    A criterion is checked after every episode with the stats yielded by ActorCritic.fit_iter() and returns the
+    reason for stopping once it is met.
+    """
+
+    def reset(self) -> None:
+        """Clears the state of the criterion at the start of a fit."""
+
+        pass
+
+    @abstractmethod
+    def __call__(self, actor_critic: 'ActorCritic', stats: dict) -> Optional[str]:
+        """Checks the criterion after an episode.
+
+        :param actor_critic: The ActorCritic being fitted.
+        :param stats: Stats of the episode that just finished.
+        :return: The reason for stopping if the criterion is met, otherwise None.
+        """
+
+        raise NotImplementedError('Subclasses must implement __call__()')
+
+
+class PlateauStopping(StoppingCriterion):
+    """Stops when the mean number of steps of the last window episodes no longer differs from that of the window
+    before it by more than tolerance (relative)."""
+
+    def __init__(self, window: int = 50, tolerance: float = 0.01):
+        """
+        :param window: Number of episodes in each window.
+        :param tolerance: Maximum relative change of the mean number of steps between the two windows.
+        """
+
+        self.window: int = window
+        self.tolerance: float = tolerance
+        self.steps: deque = deque(maxlen=2 * window)
+
+    def reset(self) -> None:
+        self.steps.clear()
+
+    def __call__(self, actor_critic: 'ActorCritic', stats: dict) -> Optional[str]:
+        self.steps.append(stats['steps'])
+        if len(self.steps) < 2 * self.window:
+            return None
+        steps = np.array(self.steps)
+        previous, current = steps[:self.window].mean(), steps[self.window:].mean()
+        if abs(current - previous) <= self.tolerance * previous:
+            return f'steps plateaued at {current:.1f} per episode over the last {self.window} episodes'
+        return None
+
+
+class TargetRewardStopping(StoppingCriterion):
+    """Stops when the mean total reward of the last window episodes reaches target."""
+
+    def __init__(self, target: float, window: int = 20):
+        """
+        :param target: Mean total reward per episode to reach.
+        :param window: Number of episodes the mean is taken over.
+        """
+
+        self.target: float = target
+        self.window: int = window
+        self.rewards: deque = deque(maxlen=window)
+
+    def reset(self) -> None:
+        self.rewards.clear()
+
+    def __call__(self, actor_critic: 'ActorCritic', stats: dict) -> Optional[str]:
+        self.rewards.append(stats['total_reward'])
+        if len(self.rewards) == self.window and np.mean(self.rewards) >= self.target:
+            return f'mean reward {np.mean(self.rewards):.1f} over the last {self.window} episodes reached ' \
+                   f'the target {self.target}'
+        return None
+
+
+class TimeLimitStopping(StoppingCriterion):
+    """Stops when the fit has run for more than a number of (wall-clock) seconds."""
+
+    def __init__(self, seconds: float):
+        """
+        :param seconds: Wall-clock budget of the fit.
+        """
+
+        self.seconds: float = seconds
+        self.start_time: Optional[float] = None
+
+    def reset(self) -> None:
+        self.start_time = time.perf_counter()
+
+    def __call__(self, actor_critic: 'ActorCritic', stats: dict) -> Optional[str]:
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        elapsed = time.perf_counter() - self.start_time
+        if elapsed >= self.seconds:
+            return f'time budget of {self.seconds} seconds used up ({elapsed:.1f} seconds)'
+        return None
+
+
+class GreedyEvaluationStopping(StoppingCriterion):
+    """Evaluates the greedy policy every interval episodes and stops when it reaches threshold."""
+
+    def __init__(self,
+                 threshold: float,
+                 metric: str = 'mean_reward',
+                 mode: str = 'max',
+                 interval: int = 50,
+                 n_episodes: int = 10):
+        """
+        :param threshold: Value of metric the greedy policy must reach.
+        :param metric: Stat returned by ActorCritic.evaluate() that is compared to threshold, e.g. {mean_reward,
+                       mean_steps, p50_steps, success_rate}
+        :param mode: Whether the metric should reach threshold from below or above. {max, min}
+                     max: stop when metric >= threshold (e.g. mean_reward).
+                     min: stop when metric <= threshold (e.g. mean_steps in TowersOfHanoi).
+        :param interval: Number of episodes between each evaluation.
+        :param n_episodes: Number of greedy episodes per evaluation.
+        """
+
+        if mode not in ('max', 'min'):
+            raise ValueError(f'Unknown mode {mode}. Expected max or min.')
+        self.threshold: float = threshold
+        self.metric: str = metric
+        self.mode: str = mode
+        self.interval: int = interval
+        self.n_episodes: int = n_episodes
+
+    def __call__(self, actor_critic: 'ActorCritic', stats: dict) -> Optional[str]:
+        if (stats['episode'] + 1) % self.interval != 0:
+            return None
+        value = actor_critic.evaluate(self.n_episodes)[self.metric]
+        if (value >= self.threshold) if self.mode == 'max' else (value <= self.threshold):
+            return f'greedy evaluation reached {self.metric} {value:.1f} (threshold {self.threshold})'
+        return None
+
+
+STOPPING_CRITERIA = {
+    'plateau': PlateauStopping,
+    'target_reward': TargetRewardStopping,
+    'max_seconds': TimeLimitStopping,
+    'greedy_evaluation': GreedyEvaluationStopping,
+}
+
+
+def get_stopping_criteria(config: dict[str, Union[dict, float]]) -> list[StoppingCriterion]:
+    """Creates stopping criteria from the stopping section of a config.
+
+    :param config: Parameters of each criterion by name (see STOPPING_CRITERIA). The parameters are either keyword
+                   arguments, or a single value passed as the first argument (e.g. max_seconds: 60).
+    :return: The criteria.
+    """
+
+    criteria = []
+    for name, params in config.items():
+        if name not in STOPPING_CRITERIA:
+            raise ValueError(f'Unknown stopping criterion {name}. Expected one of {list(STOPPING_CRITERIA)}.')
+        criterion = STOPPING_CRITERIA[name]
+        criteria.append(criterion(**params) if isinstance(params, dict) else criterion(params))
+    return criteria
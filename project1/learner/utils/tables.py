@@ -0,0 +1,333 @@
+import multiprocessing as mp
+import os
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class Table(ABC):
+    """Abstract table class used as a common interface for policy and value tables.
+
+    Rows are stored in a contiguous 2-D (or 1-D for scalar rows) array, data, and index() maps a state to its row.
+    Indexing the table with a state (table[state]) returns its row, like indexing a state_shape + row_shape array.
+    Flat indices into data.reshape(-1) are therefore row * prod(row_shape) + position in row.
+    States can be given as tuples or as integer state ids (see Environment.flat_states). Tuples are converted to state
+    ids by the state_id function the table is created with, usually Environment.state_id.
+    """
+
+    data: np.ndarray
+
+    def __init__(self,
+                 state_shape: tuple,
+                 row_shape: tuple = (),
+                 state_id: Optional[Callable[[object], int]] = None):
+        """
+        :param state_shape: The shape of the state space.
+        :param row_shape: The shape of the row stored for each state (e.g. (actions,) for a policy table).
+        :param state_id: Converts a state (tuple or state id) to its state id, e.g. Environment.state_id. If not
+                         specified, states must be given as state ids.
+        """
+
+        self.state_shape: tuple = tuple(state_shape)
+        self.row_shape: tuple = tuple(row_shape)
+        self.n_states: int = int(np.prod(self.state_shape))
+        self._state_id: Optional[Callable[[object], int]] = state_id
+
+    def state_id(self, state) -> int:
+        """Converts a state to its integer state id.
+
+        :param state: State in the form of a tuple or a state id.
+        :return: The state id.
+        """
+
+        if self._state_id is not None:
+            return self._state_id(state)
+        if isinstance(state, (int, np.integer)):
+            return int(state)
+        raise ValueError('States must be given as state ids, as the table was created without a state_id function.')
+
+    @abstractmethod
+    def index(self, state) -> int:
+        """Finds the row of a state.
+
+        :param state: State in the form of a tuple or a state id.
+        :return: Row index into data.
+        """
+
+        raise NotImplementedError('Subclasses must implement index()')
+
+    @abstractmethod
+    def to_array(self) -> np.ndarray:
+        """Returns the table as an array of shape state_shape + row_shape.
+
+        :return: The table.
+        """
+
+        raise NotImplementedError('Subclasses must implement to_array()')
+
+    def __getitem__(self, state) -> np.ndarray:
+        index = self.index(state)  # Found before data is read, as it may reallocate data
+        return self.data[index]
+
+    def __setitem__(self, state, value) -> None:
+        index = self.index(state)
+        self.data[index] = value
+
+    @abstractmethod
+    def state_dict(self) -> dict[str, np.ndarray]:
+        """Returns the contents of the table as arrays, e.g. for checkpointing.
+
+        :return: Arrays, by name.
+        """
+
+        raise NotImplementedError('Subclasses must implement state_dict()')
+
+    @abstractmethod
+    def load_state_dict(self, state_dict: dict[str, np.ndarray]) -> None:
+        """Restores the contents of the table from arrays returned by state_dict().
+
+        :param state_dict: Arrays, by name.
+        """
+
+        raise NotImplementedError('Subclasses must implement load_state_dict()')
+
+    def flush(self) -> None:
+        """Writes the table to its backing storage, if it has any."""
+
+        pass
+
+    def share_memory(self) -> None:
+        """Moves the table to memory that is shared with processes forked afterwards, so that their updates are
+        seen by each other.
+        """
+
+        raise ValueError(f'{self.__class__.__name__} can not be shared between processes.')
+
+    @property
+    def shape(self) -> tuple:
+        return self.state_shape + self.row_shape
+
+
+class DenseTable(Table):
+    """Table with one row per state, allocated for the whole state space and indexed by flat state id."""
+
+    def __init__(self,
+                 state_shape: tuple,
+                 row_shape: tuple = (),
+                 values: Optional[np.ndarray] = None,
+                 state_id: Optional[Callable[[object], int]] = None):
+        """
+        :param state_shape: The shape of the state space.
+        :param row_shape: The shape of the row stored for each state (e.g. (actions,) for a policy table).
+        :param values: Initial values of shape state_shape + row_shape. Zeros if not specified.
+        :param state_id: Converts a state (tuple or state id) to its state id, e.g. Environment.state_id. If not
+                         specified, states must be given as state ids.
+        """
+
+        super().__init__(state_shape, row_shape, state_id)
+        if values is None:
+            self.data: np.ndarray = np.zeros((self.n_states,) + self.row_shape)
+        else:
+            self.data: np.ndarray = np.ascontiguousarray(values, dtype=float).reshape((self.n_states,) + self.row_shape)
+
+    def index(self, state) -> int:
+        """Finds the row of a state.
+
+        :param state: State in the form of a tuple or a state id.
+        :return: Row index into data (the state id).
+        """
+
+        return self.state_id(state)
+
+    def to_array(self) -> np.ndarray:
+        """Returns the table as an array of shape state_shape + row_shape.
+
+        :return: The table (a view of data).
+        """
+
+        return self.data.reshape(self.shape)
+
+    def state_dict(self) -> dict[str, np.ndarray]:
+        """Returns the contents of the table as arrays, e.g. for checkpointing.
+
+        :return: {'data': data}
+        """
+
+        return {'data': self.data}
+
+    def load_state_dict(self, state_dict: dict[str, np.ndarray]) -> None:
+        """Restores the contents of the table from arrays returned by state_dict().
+
+        :param state_dict: Arrays, by name.
+        """
+
+        self.data[:] = state_dict['data']
+
+    def share_memory(self) -> None:
+        """Moves the table to memory that is shared with processes forked afterwards, so that their updates are
+        seen by each other.
+        """
+
+        shared = np.frombuffer(mp.RawArray('d', self.data.size), dtype=float).reshape(self.data.shape)
+        shared[:] = self.data
+        self.data = shared
+
+
+class MemmapTable(DenseTable):
+    """Dense table backed by a memory-mapped file, so its size is bounded by disk rather than RAM.
+
+    The file is created zero-filled, which the OS does lazily, and rows that should not start at zero are initialized
+    chunk by chunk so that pages are written sequentially. An existing file is overwritten, unless reuse is set: then
+    it is opened as is (e.g. a table left by a finished fit, to serve it), which takes close to no time. Other
+    processes can open the file with np.memmap to read the table zero-copy while it is trained or served.
+
+    state_dict() returns the whole table, so every checkpoint copies (and hashes) the whole file. The cost of a
+    checkpoint therefore grows with the size of the table; use a checkpoint_interval to match.
+    """
+
+    def __init__(self,
+                 path: str,
+                 state_shape: tuple,
+                 row_shape: tuple = (),
+                 chunk_initializer: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                 chunk_size: int = 2 ** 16,
+                 state_id: Optional[Callable[[object], int]] = None,
+                 reuse: bool = False):
+        """
+        :param path: path/to/table/file
+        :param state_shape: The shape of the state space.
+        :param row_shape: The shape of the row stored for each state (e.g. (actions,) for a policy table).
+        :param chunk_initializer: Called with an array of state ids to get their initial rows when the file is
+                                  created. Rows are left at zero if not specified.
+        :param chunk_size: Number of states initialized at a time.
+        :param state_id: Converts a state (tuple or state id) to its state id, e.g. Environment.state_id. If not
+                         specified, states must be given as state ids.
+        :param reuse: Whether to open an existing file as is instead of overwriting it with a new table. Only reuse
+                      a file to continue with the table it holds, e.g. to serve a trained policy.
+        """
+
+        Table.__init__(self, state_shape, row_shape, state_id)
+        self.path: str = path
+        if not reuse or not os.path.exists(path):
+            self._create(chunk_initializer, chunk_size)
+        elif os.path.getsize(path) != self.n_states * int(np.prod(self.row_shape)) * np.dtype(float).itemsize:
+            raise ValueError(f'Table file {path} does not match table shape {self.shape}.')
+        self.data: np.ndarray = np.memmap(path, dtype=float, mode='r+', shape=(self.n_states,) + self.row_shape)
+
+    def _create(self, chunk_initializer: Optional[Callable[[np.ndarray], np.ndarray]], chunk_size: int) -> None:
+        """Creates and initializes the table file.
+
+        The file is initialized under a temporary name and moved in place when done, so an interrupted
+        initialization is never mistaken for a finished table.
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        data = np.memmap(tmp_path, dtype=float, mode='w+', shape=(self.n_states,) + self.row_shape)
+        if chunk_initializer is not None:
+            for start in range(0, self.n_states, chunk_size):
+                state_ids = np.arange(start, min(start + chunk_size, self.n_states))
+                data[state_ids] = chunk_initializer(state_ids)
+        data.flush()
+        del data
+        os.replace(tmp_path, self.path)
+
+    def flush(self) -> None:
+        """Writes changes in the table to the file."""
+
+        self.data.flush()
+
+    def share_memory(self) -> None:
+        """Nothing has to be done, as the file is mapped shared and forked processes see each other's updates."""
+
+        pass
+
+
+class SparseTable(Table):
+    """Table that only allocates rows for the states that have been visited.
+
+    Rows are allocated on first visit in a growing 2-D (or 1-D) array, data, and found through a hash map from state
+    id to row index. Memory therefore tracks the number of visited states rather than the size of the state space.
+    """
+
+    def __init__(self,
+                 state_shape: tuple,
+                 row_shape: tuple = (),
+                 row_initializer: Optional[Callable[[tuple], np.ndarray]] = None,
+                 capacity: int = 1024,
+                 state_id: Optional[Callable[[object], int]] = None):
+        """
+        :param state_shape: The shape of the state space.
+        :param row_shape: The shape of the row stored for each state (e.g. (actions,) for a policy table).
+        :param row_initializer: Called with a state (tuple) the first time it is visited to get the initial row.
+                                Rows are initialized to zeros if not specified.
+        :param capacity: Initial number of rows allocated. Doubles when full.
+        :param state_id: Converts a state (tuple or state id) to its state id, e.g. Environment.state_id. If not
+                         specified, states must be given as state ids.
+        """
+
+        super().__init__(state_shape, row_shape, state_id)
+        self.row_initializer: Optional[Callable[[tuple], np.ndarray]] = row_initializer
+        self.data: np.ndarray = np.zeros((capacity,) + self.row_shape)
+        self.rows: dict[int, int] = {}  # State id -> row index
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _initial_row(self, state_id: int):
+        if self.row_initializer is None:
+            return 0.0
+        return self.row_initializer(tuple(int(s) for s in np.unravel_index(state_id, self.state_shape)))
+
+    def index(self, state) -> int:
+        """Finds the row of a state, allocating and initializing it on first visit.
+
+        :param state: State in the form of a tuple or a state id.
+        :return: Row index into data.
+        """
+
+        state_id = self.state_id(state)
+        index = self.rows.get(state_id)
+        if index is None:
+            index = len(self.rows)
+            if index == len(self.data):
+                data = np.zeros((2 * len(self.data),) + self.row_shape)
+                data[:index] = self.data
+                self.data = data
+            self.data[index] = self._initial_row(state_id)
+            self.rows[state_id] = index
+        return index
+
+    def to_array(self) -> np.ndarray:
+        """Returns the table as a dense array of shape state_shape + row_shape.
+
+        Unvisited states get their initial row, but are not allocated in the table.
+
+        :return: The table (a copy).
+        """
+
+        array = np.empty((self.n_states,) + self.row_shape)
+        for state_id in range(self.n_states):
+            index = self.rows.get(state_id)
+            array[state_id] = self._initial_row(state_id) if index is None else self.data[index]
+        return array.reshape(self.shape)
+
+    def state_dict(self) -> dict[str, np.ndarray]:
+        """Returns the contents of the table as arrays, e.g. for checkpointing.
+
+        :return: {'data': allocated rows, 'state_ids': state id of each allocated row}
+        """
+
+        return {'data': self.data[:len(self.rows)], 'state_ids': np.fromiter(self.rows.keys(), dtype=np.int64)}
+
+    def load_state_dict(self, state_dict: dict[str, np.ndarray]) -> None:
+        """Restores the contents of the table from arrays returned by state_dict().
+
+        :param state_dict: Arrays, by name.
+        """
+
+        n_rows = len(state_dict['state_ids'])
+        self.data = np.zeros((max(n_rows, len(self.data)),) + self.row_shape)
+        self.data[:n_rows] = state_dict['data']
+        self.rows = {int(state_id): index for index, state_id in enumerate(state_dict['state_ids'])}
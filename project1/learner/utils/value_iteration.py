@@ -0,0 +1,106 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from environments.environment import Environment
+from environments.transition_model import TransitionModel
+from learner.utils.tables import SparseTable, Table
+
+if TYPE_CHECKING:
+    from learner.actor_critic import ActorCritic
+
+
+def value_iteration(model: TransitionModel,
+                    discount: float,
+                    tolerance: float = 1e-6,
+                    max_iterations: int = 10000) -> tuple[np.ndarray, np.ndarray]:
+    """Computes the optimal state and action values of a transition model with value iteration.
+
+    Every iteration backs up all states at once. Only legal actions are considered, and the value of terminal states
+    is fixed at zero.
+
+    :param model: Transition model of the environment.
+    :param discount: Discount factor. Must be below 1 for environments where episodes can go on forever.
+    :param tolerance: Iteration stops when no state value changes by more than this.
+    :param max_iterations: Maximum number of iterations.
+    :return: (v, q)
+                v: optimal state values, (n_states,)
+                q: optimal action values, (n_states, actions), with np.nan for illegal actions
+    """
+
+    has_legal_action = model.legal.any(axis=1) & ~model.terminal
+    v = np.zeros(model.n_states)
+    for _ in range(max_iterations):
+        q = np.sum(model.probabilities * (model.rewards + discount * v[model.next_states]), axis=-1)
+        q = np.where(model.legal, q, -np.inf)
+        new_v = np.where(has_legal_action, q.max(axis=1), 0.0)
+        converged = np.max(np.abs(new_v - v)) <= tolerance
+        v = new_v
+        if converged:
+            break
+    return v, np.where(model.legal, q, np.nan)
+
+
+def _get_transition_model(environment: Environment) -> TransitionModel:
+    model = environment.transition_model()
+    if model is None:
+        raise ValueError(f'{environment.__class__.__name__} does not implement transition_model().')
+    return model
+
+
+def _blend_table(table: Table, values: np.ndarray, weight: float) -> None:
+    """Moves every row of a table towards values.
+
+    Sparse tables get a row allocated for every state.
+
+    :param table: Table to update.
+    :param values: Values with one row per state id.
+    :param weight: Weight of values, from 0 (table is left as is) to 1 (table is replaced by values).
+    """
+
+    if isinstance(table, SparseTable):
+        for state_id in range(table.n_states):
+            table[state_id] = (1 - weight) * table[state_id] + weight * values[state_id]
+    else:
+        table.data[:] = (1 - weight) * table.data + weight * values.reshape(table.data.shape)
+
+
+def warm_start(actor_critic: 'ActorCritic', weight: float = 1.0, actor: bool = True, critic: bool = True) -> None:
+    """Seeds the policy table of the actor with optimal action values, and the value table of the critic with
+    optimal state values, computed by value iteration on the transition model of the environment.
+
+    :param actor_critic: ActorCritic whose tables are seeded.
+    :param weight: How far the tables are moved towards the optimal values, from 0 (not at all) to 1 (fully).
+    :param actor: Whether to seed the policy table of the actor.
+    :param critic: Whether to seed the value table of the critic. Only TableCritic is supported.
+    """
+
+    model = _get_transition_model(actor_critic.environment)
+    if actor:
+        _, q = value_iteration(model, actor_critic.actor.discount)
+        _blend_table(actor_critic.actor.pi, q, weight)
+        actor_critic.actor.invalidate_greedy_cache()
+    if critic:
+        if not hasattr(actor_critic.critic, 'v') or not isinstance(actor_critic.critic.v, Table):
+            raise ValueError(f'{actor_critic.critic.__class__.__name__} has no value table to warm start.')
+        v, _ = value_iteration(model, actor_critic.critic.discount)
+        _blend_table(actor_critic.critic.v, v, weight)
+
+
+def policy_agreement(actor_critic: 'ActorCritic', tolerance: float = 1e-6) -> float:
+    """Measures how close the greedy policy of the actor is to an optimal policy.
+
+    :param actor_critic: ActorCritic whose policy is compared.
+    :param tolerance: Actions with an optimal value within this of the best value count as optimal (there can be ties).
+    :return: Fraction of non-terminal states where the greedy action of the actor is optimal.
+    """
+
+    model = _get_transition_model(actor_critic.environment)
+    _, q = value_iteration(model, actor_critic.actor.discount)
+    states = np.flatnonzero(model.legal.any(axis=1) & ~model.terminal)
+
+    pi = actor_critic.actor.pi.to_array().reshape(model.n_states, model.actions)[states]
+    greedy = np.nanargmax(pi, axis=1)
+    q = q[states]
+    optimal = q[np.arange(len(states)), greedy] >= np.nanmax(q, axis=1) - tolerance
+    return float(np.mean(optimal))
@@ -1,25 +1,26 @@
 import argparse
 
-import numpy as np
-import torch
-
 from environments.environment import Environment
 from environments.gambler import Gambler
 from learner.actor_critic import ActorCritic
+from learner.utils.profiler import PhaseProfiler
 from utils.config_parser import ConfigParser
-import random
-
-# Set seed for reproducibility
-SEED = 14
-random.seed(SEED)
-np.random.seed(SEED)
-torch.manual_seed(SEED)
+from utils.seeding import set_seed
 
 parser = argparse.ArgumentParser()
 parser.add_argument('-c', '--config', help='path/to/config/file', required=True)
 parser.add_argument('-v', '--visualize', action='store_true', help='Flag used to get visualizations.')
+parser.add_argument('-s', '--seed', type=int, default=14, help='Seed used for reproducibility.')
+parser.add_argument('-r', '--resume', action='store_true', help='Continue fit from checkpoint_folder (set under fit).')
+parser.add_argument('-p', '--profile', nargs='?', const='', metavar='PATH',
+                    help='Time each phase of the fit loop. Timings are exported to PATH (.json/.csv) if specified.')
+parser.add_argument('-e', '--evaluate', type=int, metavar='N', help='Evaluate the fitted policy in N greedy episodes.')
+parser.add_argument('-w', '--eval-workers', type=int, default=1, help='Number of worker processes used to evaluate.')
 args = parser.parse_args()
 
+# Set seed for reproducibility
+set_seed(args.seed)
+
 config_parser = ConfigParser(args.config)
 
 environment: Environment = config_parser.environment
@@ -31,11 +32,22 @@ visualization_parameters = config_parser.visualization_parameters
 show = visualization_parameters['show']
 vis_sleep = visualization_parameters['vis_sleep']
 
+profiler = PhaseProfiler() if args.profile is not None else None
+
 print('---FITTING MODEL---')
-actor_critic.fit(**fit_parameters)
+actor_critic.fit(**fit_parameters, resume=args.resume, profiler=profiler)
+if profiler is not None:
+    profiler.print_summary()
+    if args.profile:
+        profiler.export(args.profile)
 if show:
     actor_critic.visualize_fit()
 
+if args.evaluate:
+    print('---EVALUATING MODEL---')
+    for stat, value in actor_critic.evaluate(args.evaluate, n_workers=args.eval_workers).items():
+        print(f'{stat}: {value}')
+
 print('---RUNNING MODEL---')
 actor_critic.run(visualize=show, vis_sleep=vis_sleep)
 if type(environment) is Gambler and show:
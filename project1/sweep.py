@@ -0,0 +1,103 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import yaml
+
+from utils.config_parser import ConfigParser
+from utils.seeding import set_seed
+
+
+def expand_grid(grid: dict) -> list[dict]:
+    """Expands a grid of overrides into every combination of values.
+
+    Example: {'a.b': [1, 2], 'c': [3]} -> [{'a.b': 1, 'c': 3}, {'a.b': 2, 'c': 3}]
+
+    :param grid: Dotted config paths mapped to lists of values.
+    :return: List of overrides, one per combination.
+    """
+
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def per_run_paths(config_file: str, overrides: dict, run_index: int) -> dict:
+    """Suffixes the paths the fit writes to (fit.metrics_path and fit.checkpoint_folder) with the run index, so that
+    parallel runs do not write to the same files.
+
+    :param config_file: path/to/config/file
+    :param overrides: Dotted config paths mapped to values.
+    :param run_index: Index of the run.
+    :return: The overrides, with the suffixed paths added.
+    """
+
+    with open(config_file, "r") as stream:
+        fit_config = yaml.safe_load(stream).get('fit') or {}
+    overrides = dict(overrides)
+    for key in ('metrics_path', 'checkpoint_folder'):
+        path = overrides.get(f'fit.{key}', fit_config.get(key))
+        if path is not None:
+            root, extension = os.path.splitext(path.rstrip('/'))
+            overrides[f'fit.{key}'] = f'{root}_{run_index}{extension}'
+    return overrides
+
+
+def fit_configuration(config_file: str, overrides: dict, seed: int, run_index: int = 0) -> np.ndarray:
+    """Builds an ActorCritic from the config file and overrides, and fits it using the given seed.
+
+    :param config_file: path/to/config/file
+    :param overrides: Dotted config paths mapped to values.
+    :param seed: Seed used for the run.
+    :param run_index: Index of the run, used to give the run its own metrics file and checkpoint folder.
+    :return: Steps taken in each episode.
+    """
+
+    set_seed(seed)
+    config_parser = ConfigParser(config_file, per_run_paths(config_file, overrides, run_index))
+    if 'torch' in sys.modules:  # Runs are the unit of parallelism, so torch should not use more threads
+        sys.modules['torch'].set_num_threads(1)
+    actor_critic = config_parser.actor_critic
+    actor_critic.fit(**config_parser.fit_parameters, verbose=False)
+    return actor_critic.steps
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-c', '--config', help='path/to/base/config/file', required=True)
+    parser.add_argument('-g', '--grid', help='path/to/grid/file mapping dotted config paths to lists of values.')
+    parser.add_argument('-s', '--seeds', type=int, nargs='+', default=[14],
+                        help='Seeds to fit each configuration with.')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='Number of worker processes.')
+    parser.add_argument('-o', '--output', default='sweep_results.npz', help='path/to/results/file (.npz)')
+    args = parser.parse_args()
+
+    grid = {}
+    if args.grid:
+        with open(args.grid, "r") as stream:
+            grid = yaml.safe_load(stream) or {}
+
+    runs = [(overrides, seed) for overrides in expand_grid(grid) for seed in args.seeds]
+    print(f'---SWEEPING {len(runs)} RUNS ON {args.workers} WORKERS---')
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(fit_configuration, args.config, overrides, seed, i)
+                   for i, (overrides, seed) in enumerate(runs)]
+        results = []
+        for i, ((overrides, seed), future) in enumerate(zip(runs, futures)):
+            results.append(future.result())
+            print(f'Finished run {i} ({overrides}, seed={seed}): mean steps {results[-1].mean():.1f}')
+
+    # Runs may have different numbers of episodes; pad with 0 (no episode) so they fit in one array
+    steps = np.zeros((len(results), max(len(r) for r in results)), dtype=int)
+    for i, r in enumerate(results):
+        steps[i, :len(r)] = r
+
+    np.savez(args.output,
+             steps=steps,
+             seeds=np.array([seed for _, seed in runs]),
+             overrides=np.array([json.dumps(overrides) for overrides, _ in runs]))
+    print(f'Saved results to {args.output}')
@@ -0,0 +1,42 @@
+import numpy as np
+
+from environments.cartpole import CartPole
+from environments.vector_cartpole import VectorCartPole
+from learner.actor_critic import ActorCritic
+from learner.actors.actor import Actor
+from learner.critics.table_critic import TableCritic
+from utils.seeding import set_seed
+
+BUCKETS = (6, 6, 6, 6)
+
+
+def _fitted_actor_critic() -> ActorCritic:
+    set_seed(14)
+    environment = CartPole(buckets=BUCKETS, n_timesteps=300)
+    actor = Actor(environment, discount=0.99, trace_decay=0.9, epsilon_decay=0.04)
+    critic = TableCritic(environment=environment, discount=0.99, trace_decay=0.9)
+    actor_critic = ActorCritic(environment, actor, critic)
+    actor_critic.fit(40, verbose=False)
+    return actor_critic
+
+
+def test_vectorized_evaluation_agrees_with_in_process():
+    actor_critic = _fitted_actor_critic()
+    n_episodes = 400
+    in_process = actor_critic.evaluate(n_episodes)
+    # One instance per episode is the worst case for keeping only the episodes that finish first
+    vector_environment = VectorCartPole(n_envs=n_episodes, buckets=BUCKETS, n_timesteps=300)
+    vectorized = actor_critic.evaluate(n_episodes, vector_environment=vector_environment)
+
+    assert vectorized['n_episodes'] == n_episodes
+    standard_error = np.hypot(in_process['std_steps'], vectorized['std_steps']) / np.sqrt(n_episodes)
+    assert abs(vectorized['mean_steps'] - in_process['mean_steps']) < 4 * standard_error
+    assert abs(vectorized['p95_steps'] - in_process['p95_steps']) <= 0.25 * in_process['p95_steps']
+    assert abs(vectorized['success_rate'] - in_process['success_rate']) < 0.1
+
+
+def test_rollout_returns_exactly_n_episodes():
+    set_seed(14)
+    vector_environment = VectorCartPole(n_envs=7, buckets=BUCKETS, n_timesteps=50)
+    steps, rewards, final_states = vector_environment.rollout(lambda states: np.zeros(len(states), dtype=int), 30)
+    assert len(steps) == len(rewards) == len(final_states) == 30
@@ -0,0 +1,53 @@
+import csv
+import json
+
+import pytest
+
+from environments.gambler import Gambler
+from learner.actor_critic import ActorCritic
+from learner.actors.actor import Actor
+from learner.critics.table_critic import TableCritic
+from learner.utils.metrics import get_metrics_sink
+from learner.utils.stopping import StoppingCriterion
+from utils.seeding import set_seed
+
+
+class _Interrupt(StoppingCriterion):
+    """Crashes the fit after the given episode, like a fit that is killed between two checkpoints."""
+
+    def __init__(self, episode: int):
+        self.episode = episode
+
+    def __call__(self, actor_critic, stats):
+        if stats['episode'] == self.episode:
+            raise RuntimeError('Interrupted')
+        return None
+
+
+def _actor_critic() -> ActorCritic:
+    environment = Gambler(win_probability=0.4, goal_money=20)
+    return ActorCritic(environment, Actor(environment), TableCritic(environment=environment))
+
+
+def _read_episodes(path: str) -> list[int]:
+    with open(path, 'r', newline='') as f:
+        if path.endswith('.csv'):
+            return [int(row['episode']) for row in csv.DictReader(f)]
+        return [json.loads(line)['episode'] for line in f]
+
+
+@pytest.mark.parametrize('extension', ['csv', 'jsonl'])
+def test_resumed_fit_writes_each_episode_once(tmp_path, extension):
+    path = str(tmp_path / f'metrics.{extension}')
+    checkpoint_folder = str(tmp_path / 'checkpoint')
+
+    set_seed(14)
+    with pytest.raises(RuntimeError):
+        _actor_critic().fit(40, verbose=False, metrics_sink=get_metrics_sink(path, buffer_size=1),
+                            checkpoint_folder=checkpoint_folder, checkpoint_interval=20,
+                            stopping_criteria=[_Interrupt(27)])
+    assert _read_episodes(path) == list(range(27))  # Episode 27 was not finished
+
+    _actor_critic().fit(40, verbose=False, metrics_sink=get_metrics_sink(path, buffer_size=1),
+                        checkpoint_folder=checkpoint_folder, checkpoint_interval=20, resume=True)
+    assert _read_episodes(path) == list(range(40))
@@ -0,0 +1,13 @@
+import numpy as np
+
+from learner.utils.tables import MemmapTable
+
+
+def test_memmap_table_overwrites_existing_file_unless_reused(tmp_path):
+    path = str(tmp_path / 'table.npy')
+    table = MemmapTable(path, (3, 4))
+    table[6] = 5.0  # State (1, 2)
+    table.flush()
+
+    assert MemmapTable(path, (3, 4), reuse=True)[6] == 5.0
+    assert np.all(MemmapTable(path, (3, 4)).data == 0.0)
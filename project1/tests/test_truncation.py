@@ -0,0 +1,33 @@
+from environments.cartpole import CartPole
+from learner.actor_critic import ActorCritic
+from learner.actors.actor import Actor
+from learner.critics.table_critic import TableCritic
+from utils.seeding import set_seed
+
+
+def _terminal_flags(n_timesteps: int) -> list[bool]:
+    set_seed(14)
+    environment = CartPole(buckets=(6, 6, 6, 6), n_timesteps=n_timesteps)
+    critic = TableCritic(environment=environment)
+    actor_critic = ActorCritic(environment, Actor(environment), critic)
+
+    flags = []
+    get_delta = critic.get_delta
+
+    def recording_get_delta(state, reward, next_state, terminal=False):
+        flags.append(terminal)
+        return get_delta(state, reward, next_state, terminal)
+
+    critic.get_delta = recording_get_delta
+    actor_critic.fit(1, verbose=False)
+    return flags
+
+
+def test_time_limit_is_not_terminal():
+    flags = _terminal_flags(n_timesteps=3)  # Too short for the pole to fall
+    assert flags == [False, False, False]
+
+
+def test_falling_pole_is_terminal():
+    flags = _terminal_flags(n_timesteps=10000)
+    assert flags[-1] and not any(flags[:-1])
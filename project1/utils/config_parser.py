@@ -1,65 +1,118 @@
-import inspect
+import ast
+import copy
+from typing import Any, Optional
 
 import yaml
 
 from environments.environment import Environment
-from environments.cartpole import CartPole
-from environments.towers_of_hanoi import TowersOfHanoi
-from environments.gambler import Gambler
 from learner.actors.actor import Actor
 from learner.critics.critic import Critic
-from learner.critics.table_critic import TableCritic
-from learner.critics.network_critic import NetworkCritic
 from learner.actor_critic import ActorCritic
+from learner.utils.metrics import get_metrics_sink
+from learner.utils.stopping import get_stopping_criteria
+from learner.utils.value_iteration import warm_start
+from utils.registry import get_type
 
-STRING_EXCEPTIONS = ['name', 'checkpoint_folder']
+STRING_EXCEPTIONS = ['name', 'checkpoint_folder', 'table_type', 'table_path', 'metrics_path',
+                     'learning_rate_schedule', 'epsilon_schedule']
+
+# String values that are only allowed within a section (including its subsections), by section key
+SECTION_STRING_EXCEPTIONS = {'stopping': ['metric', 'mode']}
 
 
 class ConfigParser:
-    def __init__(self, config_file: str):
+    def __init__(self, config_file: str, overrides: Optional[dict] = None):
+        """
+        :param config_file: path/to/config/file
+        :param overrides: Values replacing those in the config file, keyed by dotted path
+                          (e.g. 'actor_params.discount').
+        """
+
         with open(config_file, "r") as stream:
             self._config = yaml.safe_load(stream)
+        if overrides:
+            self._config = self._apply_overrides(self._config, overrides)
 
         self.environment: Environment = self._get_environment()
         self.actor_critic: ActorCritic = self._get_actor_critic()
+        if 'warm_start' in self._config:
+            warm_start(self.actor_critic, **self._parse_config(self._config['warm_start']))
         self.fit_parameters: dict = self._get_fit_parameters()
         self.visualization_parameters: dict = self._get_visualization_parameters()
 
-    def _parse_config(self, config) -> dict:
+    @staticmethod
+    def _apply_overrides(config: dict, overrides: dict) -> dict:
+        config = copy.deepcopy(config)
+        for path, value in overrides.items():
+            *parents, key = path.split('.')
+            section = config
+            for parent in parents:
+                section = section.setdefault(parent, {})
+            section[key] = value
+        return config
+
+    def _parse_config(self, config, string_exceptions: Optional[list[str]] = None) -> dict:
+        string_exceptions = string_exceptions or STRING_EXCEPTIONS
         parsed_config = {}
         for k, v in config.items():
             if v is not None:
                 if type(v) is dict:
-                    parsed_config[k] = self._parse_config(v)
-                elif type(v) is str and k not in STRING_EXCEPTIONS:
-                    parsed_config[k] = eval(v)
+                    parsed_config[k] = self._parse_config(v, string_exceptions + SECTION_STRING_EXCEPTIONS.get(k, []))
+                elif type(v) is str and k not in string_exceptions:
+                    parsed_config[k] = self._parse_value(k, v, string_exceptions)
                 else:
                     parsed_config[k] = v
                 parsed_config
         return parsed_config
 
+    @staticmethod
+    def _parse_value(key: str, value: str, string_exceptions: list[str]) -> Any:
+        """Parses a string config value that YAML leaves as a string, e.g. (6,6,6,6) or None.
+
+        Only Python literals are accepted, so configs cannot run code.
+
+        :param key: Key of the value, for the error message.
+        :param value: The string.
+        :param string_exceptions: Keys whose values are kept as strings in the current section, for the error message.
+        :return: The parsed value.
+        """
+
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            raise ValueError(f'Could not parse {key}: {value}. Values must be Python literals (string values are '
+                             f'only allowed for: {", ".join(string_exceptions)}).') from None
+
     def _get_environment(self) -> Environment:
-        environment = eval(self._config['environment_type'])
+        environment = get_type('environment', self._config['environment_type'])
         kwargs = self._parse_config(self._config['environment_params'])
         return environment(**kwargs)
 
     def _get_actor(self) -> Actor:
-        actor = eval(self._config['actor_type'])
+        actor = get_type('actor', self._config['actor_type'])
         kwargs = self._parse_config(self._config['actor_params'])
         return actor(environment=self.environment, **kwargs)
 
     def _get_critic(self) -> Critic:
-        critic = eval(self._config['critic_type'])
+        critic = get_type('critic', self._config['critic_type'])
         kwargs = self._parse_config(self._config['critic_params'])
         return critic(environment=self.environment, **kwargs)
 
     def _get_actor_critic(self) -> ActorCritic:
         actor = self._get_actor()
         critic = self._get_critic()
-        return ActorCritic(environment=self.environment, actor=actor, critic=critic)
+        actor_critic = get_type('actor_critic', self._config.get('actor_critic_type', 'ActorCritic'))
+        kwargs = self._parse_config(self._config.get('actor_critic_params') or {})
+        return actor_critic(environment=self.environment, actor=actor, critic=critic, **kwargs)
 
     def _get_fit_parameters(self) -> dict:
-        return self._parse_config(self._config['fit'])
+        fit_parameters = self._parse_config(self._config['fit'])
+        if 'metrics_path' in fit_parameters:
+            fit_parameters['metrics_sink'] = get_metrics_sink(fit_parameters.pop('metrics_path'),
+                                                              fit_parameters.pop('metrics_buffer_size', 100))
+        if 'stopping' in fit_parameters:
+            fit_parameters['stopping_criteria'] = get_stopping_criteria(fit_parameters.pop('stopping'))
+        return fit_parameters
 
     def _get_visualization_parameters(self) -> dict:
         return self._parse_config(self._config['visualization'])
@@ -0,0 +1,51 @@
+import importlib
+
+# Types that can be named in a config, by kind and name, as 'module:attribute'. Modules are only imported when a type
+# is looked up, so e.g. torch is only loaded when a NetworkCritic is used.
+REGISTRY: dict[str, dict[str, str]] = {
+    'environment': {
+        'CartPole': 'environments.cartpole:CartPole',
+        'Gambler': 'environments.gambler:Gambler',
+        'TowersOfHanoi': 'environments.towers_of_hanoi:TowersOfHanoi',
+    },
+    'actor': {
+        'Actor': 'learner.actors.actor:Actor',
+    },
+    'critic': {
+        'TableCritic': 'learner.critics.table_critic:TableCritic',
+        'NetworkCritic': 'learner.critics.network_critic:NetworkCritic',
+    },
+    'actor_critic': {
+        'ActorCritic': 'learner.actor_critic:ActorCritic',
+        'AsyncActorCritic': 'learner.async_actor_critic:AsyncActorCritic',
+    },
+}
+
+
+def register(kind: str, name: str, path: str) -> None:
+    """Makes a type available to configs under the given name.
+
+    :param kind: Kind of type. {environment, actor, critic, actor_critic}
+    :param name: Name used in configs.
+    :param path: Where the type is defined, as 'module:attribute'.
+    """
+
+    if kind not in REGISTRY:
+        raise ValueError(f'Unknown kind {kind}. Must be one of: {", ".join(REGISTRY)}.')
+    REGISTRY[kind][name] = path
+
+
+def get_type(kind: str, name: str) -> type:
+    """Looks up a registered type, importing its module.
+
+    :param kind: Kind of type. {environment, actor, critic, actor_critic}
+    :param name: Name used in configs.
+    :return: The type.
+    """
+
+    if kind not in REGISTRY:
+        raise ValueError(f'Unknown kind {kind}. Must be one of: {", ".join(REGISTRY)}.')
+    if name not in REGISTRY[kind]:
+        raise ValueError(f'Unknown {kind} type {name}. Must be one of: {", ".join(REGISTRY[kind])}.')
+    module_name, attribute = REGISTRY[kind][name].split(':')
+    return getattr(importlib.import_module(module_name), attribute)
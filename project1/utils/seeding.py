@@ -0,0 +1,83 @@
+import random
+import sys
+from typing import Optional
+
+import numpy as np
+
+# Seed for torch, if set_seed() was called before torch was imported. torch is only imported by the modules that use
+# it (e.g. NetworkCritic), so it is seeded when its random number generator is first needed (see seed_torch()).
+_pending_torch_seed: Optional[int] = None
+
+
+def set_seed(seed: int) -> None:
+    """Seeds all random number generators used during fitting (random, numpy and torch).
+
+    If torch has not been imported yet, it is seeded by seed_torch() instead, so that seeding does not import it.
+
+    :param seed: Seed to use.
+    """
+
+    global _pending_torch_seed
+    random.seed(seed)
+    np.random.seed(seed)
+    if 'torch' in sys.modules:
+        sys.modules['torch'].manual_seed(seed)
+        _pending_torch_seed = None
+    else:
+        _pending_torch_seed = seed
+
+
+def seed_torch() -> None:
+    """Seeds torch with the seed of the last set_seed() call, if torch was not imported at the time.
+
+    Called before torch's random number generator is first used.
+    """
+
+    global _pending_torch_seed
+    if _pending_torch_seed is not None:
+        import torch
+        torch.manual_seed(_pending_torch_seed)
+        _pending_torch_seed = None
+
+
+def get_rng_state() -> dict:
+    """Captures the state of all random number generators used during fitting. torch is left out if it has not been
+    imported.
+
+    :return: The states as arrays, so they can be stored in an .npz file.
+    """
+
+    _, random_state, random_gauss = random.getstate()
+    _, numpy_keys, numpy_pos, numpy_has_gauss, numpy_cached_gaussian = np.random.get_state()
+    state = {
+        'random_state': np.array(random_state, dtype=np.int64),
+        'random_gauss': np.array(np.nan if random_gauss is None else random_gauss),
+        'numpy_keys': numpy_keys,
+        'numpy_pos': np.array(numpy_pos),
+        'numpy_has_gauss': np.array(numpy_has_gauss),
+        'numpy_cached_gaussian': np.array(numpy_cached_gaussian),
+    }
+    if 'torch' in sys.modules:
+        seed_torch()
+        state['torch_state'] = sys.modules['torch'].get_rng_state().numpy()
+    return state
+
+
+def set_rng_state(state: dict) -> None:
+    """Restores the random number generators from a state captured by get_rng_state().
+
+    :param state: The states as arrays.
+    """
+
+    global _pending_torch_seed
+    random_gauss = float(state['random_gauss'])
+    random.setstate((3, tuple(int(s) for s in state['random_state']), None if np.isnan(random_gauss) else random_gauss))
+    np.random.set_state(('MT19937',
+                         state['numpy_keys'],
+                         int(state['numpy_pos']),
+                         int(state['numpy_has_gauss']),
+                         float(state['numpy_cached_gaussian'])))
+    if 'torch_state' in state:
+        import torch
+        torch.set_rng_state(torch.from_numpy(state['torch_state']))
+        _pending_torch_seed = None